@@ -5,14 +5,18 @@ __email__ = "gf10.alves@gmail.com"
 __license__ = "Mozilla Public License 2.0"
 __version__ = "1.0.0"
 
-from .amz_serializer import AmazonSerializer
-from .analysis import Analysis
-from .distance_matrix import DistanceMatrix
-from .geometry import Geometry
-from .package import Package
-from .route import Route
-from .stop import Stop
-from .vehicle import Vehicle
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .amz_serializer import AmazonSerializer
+    from .analysis import Analysis
+    from .distance_matrix import DistanceMatrix
+    from .geometry import Geometry
+    from .package import Package
+    from .route import Route
+    from .stop import Stop
+    from .vehicle import Vehicle
 
 __all__ = [
     "AmazonSerializer",
@@ -24,3 +28,32 @@ __all__ = [
     "Stop",
     "Vehicle",
 ]
+
+# The classes are imported on their first access (PEP 562), so importing the
+# package, or only one of its modules, does not load the plotting and mapping
+# dependencies of the others
+_LAZY_IMPORTS = {
+    "AmazonSerializer": ".amz_serializer",
+    "Analysis": ".analysis",
+    "DistanceMatrix": ".distance_matrix",
+    "Geometry": ".geometry",
+    "Package": ".package",
+    "Route": ".route",
+    "Stop": ".stop",
+    "Vehicle": ".vehicle",
+}
+
+
+def __getattr__(name: str):
+    try:
+        module = import_module(_LAZY_IMPORTS[name], __name__)
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(module, name)
+    # Bind the class, so the next accesses skip this function
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,6 +1,8 @@
+from concurrent.futures import ThreadPoolExecutor
 from functools import cached_property
 
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
 from lmr_analyzer.enums import DistanceMode
@@ -177,6 +179,42 @@ class Analysis:
         for route in self.routes_dict.values():
             route.find_bbox()
 
+    def calculate_each_route_geometry(self, max_workers: int = None) -> None:
+        """Calculate the convex hull and the minimum rotated rectangle of all
+        routes. The routes are independent, so they are processed in a thread
+        pool, which overlaps the parts of Qhull and numpy that run without the
+        GIL. For small routes the Python overhead dominates and the speedup
+        is limited.
+
+        Parameters
+        ----------
+        max_workers : int, optional
+            The number of threads. If None, the ThreadPoolExecutor default is
+            used.
+        """
+
+        def evaluate_geometry(route: Route) -> None:
+            route.create_convex_hull_polygon()
+            route.find_minimum_rotated_rectangle()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Consume the iterator so the exceptions of the threads are raised
+            list(executor.map(evaluate_geometry, self.routes))
+
+    def fit_each_route_convex_hull_to_rectangle(self) -> None:
+        """Fit the convex hull polygon of all routes to their minimum rotated
+        rectangles and store the ratios between the hull and the rectangle
+        areas, per route and as the convex_hull_rectangle_area_ratios array of
+        the analysis. The rectangles are found by rotating calipers over the
+        cached hull vertices of each route, so Qhull does not run again.
+        """
+        for route in self.routes:
+            route.fit_convex_hull_polygon_to_rectangle()
+
+        self.convex_hull_rectangle_area_ratios = np.array(
+            [route.convex_hull_polygon_ellipse_area_ratio for route in self.routes]
+        )
+
     def find_overall_bbox(self) -> None:
         """Find and select the bbox that encloses all of the routes. It kind
         requires that the bbox had been previously calculated for each route.
@@ -10,6 +10,7 @@ class BaseEnum(Enum):
 
 class DistanceMode(BaseEnum):
     HAVERSINE = "haversine"
+    EQUIRECTANGULAR = "equirectangular"
     OSM = "osm"
     OSMNX = "osmnx"
     GMAPS = "gmaps"
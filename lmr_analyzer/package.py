@@ -4,6 +4,10 @@ from lmr_analyzer.enums import PackageStatus
 class Package:
     """Class to store package information"""
 
+    # Analyses hold many packages, so they are stored in slots, without a
+    # per-instance __dict__
+    __slots__ = ("name", "dimensions", "status", "weight", "price")
+
     def __init__(
         self,
         name: str,
@@ -1,17 +1,38 @@
+import math
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import cached_property
-from multiprocessing import Pool
+from itertools import repeat
+from operator import attrgetter
 from typing import Union
 
 import numpy as np
 import requests
-from scipy.spatial import ConvexHull  # pylint: disable=no-name-in-module
-from shapely.geometry import Polygon
+from scipy.spatial.distance import cdist
+from shapely.geometry import LineString, MultiPoint, Point, Polygon
 
 from lmr_analyzer.enums import DistanceMode
 from lmr_analyzer.stop import Stop
-from lmr_analyzer.utils import get_distance
+from lmr_analyzer.utils import (
+    HTTP_SESSION,
+    MAX_REQUEST_WORKERS,
+    OSRM_MAX_ROUTE_SIZE,
+    convex_hull,
+    convex_hull_vertices,
+    drive_distance_legs_osm,
+    drive_distance_matrix_gmaps,
+    drive_distance_table_osm,
+    equirectangular_vector,
+    get_distance,
+    haversine_from_chords,
+    haversine_pairwise,
+    haversine_sequence,
+    intern_name,
+    nan_statistics,
+    rotating_calipers,
+    unit_vectors,
+)
 from lmr_analyzer.vehicle import Vehicle
 
 
@@ -25,14 +46,51 @@ class Route:
     sequence of stops that the route is supposed to follow, usually determined
     by the route planner. The actual sequence is the sequence of stops that the
     route actually followed.
+
+    The counters, masks and coordinates derived from the stops are cached on
+    their first access. They are reset when the stops attribute is assigned;
+    after changing the stops dictionary in place, call reset_stops_cache. The
+    package counters follow the Stop contract: the packages of a stop must not
+    change after the stop is created.
     """
 
+    # The core attributes are stored in slots for faster access. The results
+    # of the evaluate_* methods and the cached properties still live in the
+    # instance __dict__, since they are set dynamically.
+    __slots__ = (
+        "name",
+        "__stops",
+        "departure_time",
+        "vehicle",
+        "cache",
+        "__distances_cache",
+        "stops_names",
+        "number_of_stops",
+        "planned_sequence",
+        "planned_sequence_names",
+        "planned_sequence_ids",
+        "planned_stops_ids",
+        "planned_sequence_coordinates",
+        "actual_sequence",
+        "actual_sequence_ids",
+        "actual_stops_ids",
+        "actual_sequence_coordinates",
+        "__dict__",
+    )
+
+    # Data type of the coordinates arrays. Set it to np.float32 to halve the
+    # memory traffic of the geometric reductions on large fleets, at the cost
+    # of about one meter of precision on the coordinates. The distance kernels
+    # and Qhull still compute in float64.
+    coordinates_dtype = np.float64
+
     def __init__(
         self,
         name: str,
         stops: Union[list[Stop], dict[str, Stop]],
         departure_time: Union[datetime, None] = None,
         vehicle: Union[Vehicle, None] = None,
+        cache: bool = True,
     ) -> None:
         """Initialize the route object.
 
@@ -42,54 +100,169 @@ class Route:
             A list or dictionary containing the stops of the route. If
             dictionary, the keys must be the stop names and the values must be
             the stop objects.
+        cache : bool, optional
+            If True, the euclidean and driving distances are memoized by the
+            locations of the sequence and the distance mode, so evaluating the
+            same sequence twice does not repeat the calculations. Set it to
+            False for routes whose sequences change often. Default is True.
         """
         # TODO: Decide what to-do in case the departure time is None
 
         # Save arguments as attributes
         self.name = name
-        self.stops: dict[str, Stop] = stops
+        self.stops = stops
         self.departure_time = departure_time
         self.vehicle = vehicle
+        self.cache = cache
+        self.__distances_cache: dict[tuple, np.ndarray] = {}
 
-        # Get the names of the stops and the number of stops
-        if isinstance(stops, dict):
-            self.stops_names = list(self.stops.keys())
-        elif isinstance(stops, list):
-            self.stops: dict[str, Stop] = {x.name: x for x in self.stops}
-            self.stops_names = list(self.stops.keys())
+        # Sentinels for the lazily evaluated attributes, so the guards are a
+        # single identity check instead of a failed attribute lookup
+        self.planned_sequence = self.actual_sequence = None
+        self.planned_sequence_coordinates = self.actual_sequence_coordinates = None
+        self.planned_mrr = self.actual_mrr = None
 
+    @property
+    def stops(self) -> dict[str, Stop]:
+        """The stops of the route, by name."""
+        return self.__stops
+
+    @stops.setter
+    def stops(self, stops: Union[list[Stop], dict[str, Stop]]) -> None:
+        if isinstance(stops, list):
+            stops = dict(zip(map(attrgetter("name"), stops), stops))
+        self.__stops = stops
+        self.reset_stops_cache()
+
+    def reset_stops_cache(self) -> None:
+        """Drop the counters, masks, coordinates and convex hull derived from
+        the stops, so they are evaluated again on their next access. It is
+        called when the stops attribute is assigned, and must be called after
+        changing the stops dictionary in place.
+        """
+        self.stops_names = list(self.__stops.keys())
         self.number_of_stops = len(self.stops_names)
-
-    def __get_distance_from_dist_matrix(
-        self, distance_matrix: dict, stop: Stop
-    ) -> float:
-        """Auxiliary function to get the distance from a distance matrix.
+        self.__invalidate(
+            "_Route__stops_status",
+            "route_status_dict",
+            "stops_coordinates",
+            "delivery_coordinates",
+            "depots_coordinates",
+            "depots_unit_vectors",
+            "delivery_unit_vectors",
+            "stops_distance_matrix",
+            "convex_hull_polygon",
+            "number_of_depots",
+        )
+        self.convex_hull = self.convex_hull_coords = None
+        self.convex_hull_polygon_area = self.convex_hull_perimeter = None
+        self.convex_hull_mrr = self.convex_hull_mrr_area = None
+        self.depots_dict = self.delivery_points_dict = None
+
+    def __get_distances_from_dist_matrix(
+        self, distance_matrix: Union[dict, np.ndarray], sequence: list[Stop]
+    ) -> np.ndarray:
+        """Auxiliary function to get the distances of a sequence from a
+        distance matrix. The entry of the route is resolved only once, so
+        each stop costs a single lookup in the route dictionary.
 
         Parameters
         ----------
-        distance_matrix : dict
+        distance_matrix : dict, np.ndarray
             The distance matrix dictionary to be used to calculate the driving
             distances, it must have the following structure:
             {
                 ...
             }
+            It can also be a dense (N, N) array whose rows and columns follow
+            the order of the stops of the route, such as stops_distance_matrix.
+            The distance of each stop is then read from the column of the next
+            stop of the sequence, closing back to the first one.
+        sequence : list
+            The stops whose distances to the next stop are looked up.
 
         Returns
         -------
-        float
-            Distance, in the same units as the distance matrix. If not found,
-            returns np.nan
+        np.ndarray
+            Distances, in the same units as the distance matrix. The stops that
+            are not found are set to np.nan
         """
-        return float(
-            (
-                distance_matrix.get(self.name, {})
-                .get(stop.name, {})
-                .get("distance_to_next(km)", np.nan)
+        if isinstance(distance_matrix, np.ndarray):
+            index = {name: i for i, name in enumerate(self.stops_names)}
+            rows = np.fromiter((index[stop.name] for stop in sequence), dtype=np.intp)
+            return self.__readonly(
+                distance_matrix[rows, np.roll(rows, -1)].astype(np.float64)
             )
-        )
+
+        route_matrix = distance_matrix.get(self.name, {})
+        distances = np.full(len(sequence), np.nan)
+        for i, stop in enumerate(sequence):
+            row = route_matrix.get(stop.name)
+            if row is not None:
+                distances[i] = float(row.get("distance_to_next(km)", np.nan))
+        return self.__readonly(distances)
+
+    @staticmethod
+    def __readonly(array: np.ndarray) -> np.ndarray:
+        """Flag the array as read-only and return it. The derived arrays are
+        cached and may be shared, e.g. by the distances cache, so they can be
+        viewed or stacked across routes without defensive copies."""
+        array.setflags(write=False)
+        return array
+
+    def __invalidate(self, *names: str) -> None:
+        """Drop the cached properties and results with the given names."""
+        for name in names:
+            self.__dict__.pop(name, None)
 
     # Setter methods
 
+    @staticmethod
+    def __intern_names(names) -> np.ndarray:
+        """Return the integer ids of the stop names as an array."""
+        return np.fromiter(map(intern_name, names), dtype=np.int64)
+
+    def __sequence_coordinates(self, sequence: list[Stop]) -> np.ndarray:
+        """Return the locations of the sequence as a (N, 2) array."""
+        coordinates = np.array(
+            list(map(attrgetter("location"), sequence)), dtype=self.coordinates_dtype
+        )
+        return self.__readonly(coordinates.reshape(-1, 2))
+
+    def __resolve_sequence(self, sequence: Union[list[Stop], list[str]]) -> list[Stop]:
+        """Return the sequence as a list of stops. The type of the first item
+        decides how the whole sequence is read and every item is checked
+        against it while the sequence is traversed, so it is traversed only
+        once. Stop names are resolved through the stops dictionary.
+        """
+        if len(sequence) == 0:
+            return []
+
+        # Can receive a list of stops or a list of stop names
+        if isinstance(sequence[0], Stop):
+            return [self.__check_sequence_item(x, Stop) for x in sequence]
+        if isinstance(sequence[0], str):
+            try:
+                return [self.stops[x] for x in sequence]
+            except (KeyError, TypeError) as error:
+                # Unknown stop names keep raising the KeyError
+                if all(isinstance(x, str) for x in sequence):
+                    raise
+                raise ValueError(
+                    "Invalid sequence: all elements must be of type stop or str."
+                ) from error
+
+        raise ValueError("Invalid sequence: all elements must be of type stop or str.")
+
+    @staticmethod
+    def __check_sequence_item(item, item_type):
+        """Return the item if it is of the type of the sequence."""
+        if not isinstance(item, item_type):
+            raise ValueError(
+                "Invalid sequence: all elements must be of type stop or str."
+            )
+        return item
+
     def set_planned_sequence(self, sequence: list[Stop]) -> None:
         """Set the planned sequence of the route. The planned sequence is the
         sequence of stops that the route is supposed to follow, usually
@@ -103,19 +276,17 @@ class Route:
             must be in the correct order of the planned sequence of the route.
         """
 
-        # Can receive a list of stops or a list of stop names
-        if all(isinstance(x, Stop) for x in sequence):
-            self.planned_sequence: list[Stop] = sequence
-        elif all(isinstance(x, str) for x in sequence):
-            # In case it receives a list of stop names
-            self.planned_sequence: list[Stop] = [self.stops[x] for x in sequence]
-        else:
-            raise ValueError(
-                "Invalid sequence: all elements must be of type stop or str."
-            )
-
-        self.number_of_planned_stops = len(self.planned_sequence)
-        self.planned_sequence_names = [x.name for x in self.planned_sequence]
+        self.planned_sequence: list[Stop] = self.__resolve_sequence(sequence)
+        self.planned_sequence_names = list(
+            map(attrgetter("name"), self.planned_sequence)
+        )
+        self.planned_sequence_ids = self.__intern_names(self.planned_sequence_names)
+        # Sorted unique ids, so the sequences are compared without sorting again
+        self.planned_stops_ids = np.unique(self.planned_sequence_ids)
+        self.planned_sequence_coordinates = self.__sequence_coordinates(
+            self.planned_sequence
+        )
+        self.__invalidate("planned_euclidean_distances", "planned_euclidean_statistics")
 
     def set_actual_sequence(self, sequence: Union[list[Stop], list[str]]) -> None:
         """Set the actual sequence of the route. The actual sequence is the
@@ -130,17 +301,19 @@ class Route:
             must be in the correct order of the actual sequence of the route.
         """
 
-        # Can receive a list of stops or a list of stop names
-        if all(isinstance(x, Stop) for x in sequence):
-            # In case the sequence is a list of stops already
-            self.actual_sequence: list[Stop] = sequence
-        elif all(isinstance(x, str) for x in sequence):
-            # In case it receives a list of stop names
-            self.actual_sequence: list[Stop] = [self.stops[x] for x in sequence]
-        else:
-            raise ValueError(
-                "Invalid sequence: all elements must be of type stop or str."
-            )
+        self.actual_sequence: list[Stop] = self.__resolve_sequence(sequence)
+        self.actual_sequence_ids = self.__intern_names(
+            map(attrgetter("name"), self.actual_sequence)
+        )
+        self.actual_stops_ids = np.unique(self.actual_sequence_ids)
+        self.actual_sequence_coordinates = self.__sequence_coordinates(
+            self.actual_sequence
+        )
+        self.__invalidate(
+            "actual_euclidean_distances",
+            "actual_euclidean_statistics",
+            "actual_circuity_factors",
+        )
 
     def set_vehicle(self, vehicle: Vehicle) -> None:
         """Set the vehicle that follows the route."""
@@ -150,11 +323,15 @@ class Route:
 
     @property
     def number_of_planned_stops_not_in_actual_sequence(self):
-        return len(set(self.planned_sequence_names) - set(self.actual_sequence_names))
+        return np.setdiff1d(
+            self.planned_stops_ids, self.actual_stops_ids, assume_unique=True
+        ).size
 
     @property
     def number_of_actual_stops_not_in_planned_sequence(self):
-        return len(set(self.actual_sequence_names) - set(self.planned_sequence_names))
+        return np.setdiff1d(
+            self.actual_stops_ids, self.planned_stops_ids, assume_unique=True
+        ).size
 
     def evaluate_sequence_adherence(self) -> None:
         """Evaluate the adherence of the actual sequence to the planned
@@ -183,22 +360,50 @@ class Route:
 
     @property
     def actual_sequence_names(self):
-        return [x.name for x in self.actual_sequence]
+        return list(map(attrgetter("name"), self.actual_sequence))
 
     @property
     def number_of_planned_stops(self):
-        return [x.name for x in self.actual_sequence]
+        return len(self.planned_sequence)
+
+    @cached_property
+    def __stops_status(self) -> np.ndarray:
+        """Structured array with one row per stop holding its location type
+        flags and package counters. It is built in a single pass over the stops
+        so the route level counters become numpy column reductions.
+        """
+        return np.array(
+            [
+                (
+                    stop.location_type == "delivery",
+                    stop.location_type == "pickup",
+                    stop.location_type == "depot",
+                    stop.number_of_packages,
+                    stop.number_of_delivered_packages,
+                    stop.number_of_rejected_packages,
+                    stop.number_of_failed_attempted_packages,
+                )
+                for stop in self.stops.values()
+            ],
+            dtype=[
+                ("delivery", np.bool_),
+                ("pickup", np.bool_),
+                ("depot", np.bool_),
+                ("packages", np.int64),
+                ("delivered", np.int64),
+                ("rejected", np.int64),
+                ("attempted", np.int64),
+            ],
+        )
 
     @property
     def number_of_packages(self):
         # TODO: add the location_type check if stop.location_type == "delivery"
-        return sum(stop.number_of_packages for stop in self.stops.values())
+        return int(self.__stops_status["packages"].sum())
 
     @property
     def number_of_delivery_stops(self):
-        return sum(
-            1 for stop in self.stops.values() if stop.location_type == "delivery"
-        )
+        return int(self.__stops_status["delivery"].sum())
 
     @property
     def avg_packages_per_stop(self) -> float:
@@ -213,15 +418,15 @@ class Route:
 
     @property
     def number_of_pickup_stops(self) -> int:
-        return sum(1 for stop in self.stops.values() if stop.location_type == "pickup")
+        return int(self.__stops_status["pickup"].sum())
 
     @property
     def number_of_rejected_packages(self) -> int:
-        return sum(stop.number_of_rejected_packages for stop in self.stops.values())
+        return int(self.__stops_status["rejected"].sum())
 
     @property
     def number_of_delivered_packages(self) -> int:
-        return sum(stop.number_of_delivered_packages for stop in self.stops.values())
+        return int(self.__stops_status["delivered"].sum())
 
     @property
     def failed_attempted_packages_percentage(self) -> float:
@@ -259,9 +464,7 @@ class Route:
 
     @property
     def number_of_failed_attempted_packages(self) -> int:
-        return sum(
-            stop.number_of_failed_attempted_packages for stop in self.stops.values()
-        )
+        return int(self.__stops_status["attempted"].sum())
 
     @cached_property
     def route_status_dict(self) -> dict[str, Union[int, float]]:
@@ -280,119 +483,176 @@ class Route:
 
     # Analyzing route distances and circuity factors
 
-    def __calculate_euclidean_distances(self, sequence: list[Stop]) -> np.ndarray:
+    def __get_cached_distances(self, key: tuple) -> Union[np.ndarray, None]:
+        """Return the distances previously calculated for the given key, or
+        None if they are not cached or the cache is disabled."""
+        return self.__distances_cache.get(key) if self.cache else None
+
+    def __set_cached_distances(self, key: tuple, distances: np.ndarray) -> None:
+        if self.cache:
+            self.__distances_cache[key] = distances
+
+    def __calculate_euclidean_distances(self, coordinates: np.ndarray) -> np.ndarray:
         """Evaluate the Euclidean distances between the stops of the route.
         It assumes that after the last stop the vehicle returns to the first
         stop. It creates a list of distances between the stops and save it as
         an attribute of the route. The name argument defines the name of the
         attribute that will be created.
         """
-        # TODO: Add a multiprocessing option
-
-        if len(sequence) == 0:
+        if len(coordinates) == 0:
             warnings.warn("Sequence is empty. Returning a null array.")
             # self.__dict__[name] = np.array([])
             return np.array([])
 
-        # Create a list of distances between the stops
-        distances = list(
-            map(
-                lambda x: get_distance(
-                    sequence[x].location, sequence[x + 1].location, mode="haversine"
-                )[0],
-                range(len(sequence) - 1),
-            )
-        )
+        key = ("haversine", coordinates.tobytes())
+        cached = self.__get_cached_distances(key)
+        if cached is not None:
+            return cached
 
-        # Add the distance between the last stop and the first stop
-        final_distance = get_distance(
-            sequence[-1].location,
-            sequence[0].location,
-            mode="haversine",
-        )
-        distances.append(final_distance[0])
-        # setattr(self, name, np.array(distances))
-        return np.array(distances)
+        # Distances between consecutive stops, closing back to the first stop
+        distances = self.__readonly(haversine_sequence(coordinates))
+        self.__set_cached_distances(key, distances)
+        return distances
 
     @cached_property
     def actual_euclidean_distances(self):
-        return self.__calculate_euclidean_distances(self.actual_sequence)
+        return self.__calculate_euclidean_distances(self.actual_sequence_coordinates)
+
+    @cached_property
+    def actual_euclidean_statistics(self) -> tuple[float, float, float, float]:
+        """The (total, mean, max, min) of the actual euclidean distances,
+        reduced in a single pass."""
+        return nan_statistics(self.actual_euclidean_distances)
 
     @property
     def total_actual_euclidean_distance(self):
-        return np.nansum(self.actual_euclidean_distances)
+        return self.actual_euclidean_statistics[0]
 
     @property
     def avg_actual_euclidean_distance(self):
-        return np.nanmean(self.actual_euclidean_distances)
+        return self.actual_euclidean_statistics[1]
 
     @property
     def max_actual_euclidean_distance(self):
-        return np.nanmax(self.actual_euclidean_distances)
+        return self.actual_euclidean_statistics[2]
 
     @property
     def min_actual_euclidean_distance(self):
-        return np.nanmin(self.actual_euclidean_distances)
+        return self.actual_euclidean_statistics[3]
 
     @cached_property
     def planned_euclidean_distances(self):
-        return self.__calculate_euclidean_distances(self.planned_sequence)
+        return self.__calculate_euclidean_distances(self.planned_sequence_coordinates)
+
+    @cached_property
+    def planned_euclidean_statistics(self) -> tuple[float, float, float, float]:
+        """The (total, mean, max, min) of the planned euclidean distances,
+        reduced in a single pass."""
+        return nan_statistics(self.planned_euclidean_distances)
 
     @property
     def total_planned_euclidean_distance(self):
-        return np.nansum(self.planned_euclidean_distances)
+        return self.planned_euclidean_statistics[0]
 
     @property
     def avg_planned_euclidean_distance(self):
-        return np.nanmean(self.planned_euclidean_distances)
+        return self.planned_euclidean_statistics[1]
 
     @property
     def max_planned_euclidean_distance(self):
-        return np.nanmax(self.planned_euclidean_distances)
+        return self.planned_euclidean_statistics[2]
 
     @property
     def min_planned_euclidean_distance(self):
-        return np.nanmin(self.planned_euclidean_distances)
+        return self.planned_euclidean_statistics[3]
+
+    @staticmethod
+    def __calculate_osm_distances(
+        sequence: list, session: requests.Session
+    ) -> np.ndarray:
+        """Calculate the driving distances between consecutive locations of the
+        sequence, returning to the first one in the end, with one OSRM route
+        request per window of OSRM_MAX_ROUTE_SIZE locations. If the route
+        service rejects a window, e.g. because one of its legs cannot be
+        routed, that window falls back to a table request, which sets only the
+        unreachable legs to NaN.
+        """
+        # Closing the loop gives N + 1 locations for the N legs
+        closed = sequence + sequence[:1]
+        number_of_legs = len(sequence)
+        distances_km = np.empty(number_of_legs, dtype=np.float64)
+
+        step = OSRM_MAX_ROUTE_SIZE - 1
+        for start in range(0, number_of_legs, step):
+            # Consecutive windows share their boundary location
+            window = closed[start : start + step + 1]
+            try:
+                legs_km, _ = drive_distance_legs_osm(window, session)
+            except RuntimeError:
+                matrix, _ = drive_distance_table_osm(window, session)
+                positions = np.arange(len(window) - 1)
+                legs_km = matrix[positions, positions + 1]
+            distances_km[start : start + len(window) - 1] = legs_km
+
+        return distances_km
 
     def __calculate_driving_distances(
-        self, sequence: list, name: str, mode="osm", multiprocessing: bool = False
+        self,
+        coordinates: np.ndarray,
+        name: str,
+        mode="osm",
+        multiprocessing: bool = False,
     ) -> None:
-        session = requests.Session()
         # First check if the sequence is empty
-        if len(sequence) == 0:
+        if len(coordinates) == 0:
             raise ValueError(
                 "Sequence is empty. Try to run evaluate_driving_distances method first."
             )
 
-        if not multiprocessing:
-            # Calculate the distances driving sequentially
-            osm_distances = np.array(
-                [
-                    get_distance(location1, location2, mode, session)
-                    for location1, location2 in zip(sequence[:-1], sequence[1:])
-                ]
-            )
+        key = (mode, coordinates.tobytes())
+        cached = self.__get_cached_distances(key)
+        if cached is not None:
+            setattr(self, name, cached)
+            return
 
-            # Add the distance between the last stop and the first stop
-            osm_distances = np.append(
-                osm_distances, get_distance(sequence[-1], sequence[0], mode, session)
-            )
+        if mode == "haversine":
+            # No request is needed, all the legs are evaluated at once
+            distances_km = self.__readonly(haversine_sequence(coordinates))
+            self.__set_cached_distances(key, distances_km)
+            setattr(self, name, distances_km)
+            return
+
+        session = HTTP_SESSION
+        # The request helpers format plain (lat, lon) tuples
+        sequence = list(map(tuple, coordinates.tolist()))
+
+        # The vehicle returns to the first stop after the last one
+        number_of_legs = len(sequence)
+        destinations = [sequence[i] for i in np.roll(np.arange(number_of_legs), -1)]
+
+        if mode == "osm":
+            # Request the legs to the OSRM route service in batches
+            distances_km = self.__calculate_osm_distances(sequence, session)
 
-        else:  # Start the multiprocessing
-            with Pool(processes=4) as p:
-                osm_distances = p.starmap(
-                    get_distance,
-                    zip(
-                        sequence[:-1],
-                        sequence[1:],
-                        [mode] * (len(sequence) - 1),
-                        [session] * (len(sequence) - 1),
-                    ),
+        elif not multiprocessing:
+            # Calculate the distances driving sequentially
+            distances_km = np.empty(number_of_legs, dtype=np.float64)
+            for i, (origin, destination) in enumerate(zip(sequence, destinations)):
+                distances_km[i] = get_distance(origin, destination, mode, session)[0]
+
+        else:  # Start the concurrent requests
+            # The legs are network bound, so threads overlap the requests
+            # without pickling the session to other processes
+            with ThreadPoolExecutor(max_workers=MAX_REQUEST_WORKERS) as executor:
+                osm_distances = executor.map(
+                    get_distance, sequence, destinations, repeat(mode), repeat(session)
                 )
-            osm_distances.append(get_distance(sequence[-1], sequence[0], mode, session))
-        distances_km = [x[0] for x in osm_distances]
-        # durations_min = [x[1] for x in osm_distances]
+            distances_km = np.fromiter(
+                (x[0] for x in osm_distances), dtype=np.float64, count=number_of_legs
+            )
 
+        self.__readonly(distances_km)
+        self.__set_cached_distances(key, distances_km)
         setattr(self, name, distances_km)
 
     def evaluate_driving_distances(
@@ -415,18 +675,23 @@ class Route:
             The mode to be used to calculate the driving distances. It can be
             either "osmnx" or ...
         multiprocessing: bool, optional
-            If True, it uses multiprocessing to calculate the driving distances.
-        planned_distance_matrix: dict, optional
+            If True, the driving distances of the legs are requested
+            concurrently, from a pool of MAX_REQUEST_WORKERS threads, as
+            get_distances does. Not used in the "osm" mode, which already
+            batches the legs in route requests.
+        planned_distance_matrix: dict, np.ndarray, optional
             A dictionary containing the distance matrix to be used to calculate
-            the driving distances. If not None, the other parameters will be ignored.
+            the driving distances, or a dense (N, N) array in the order of the
+            stops. If not None, the other parameters will be ignored.
             This can significantly speed up the calculation of the driving distances.
             The dictionary must have the following structure:
             {
                 ...
             }
-        actual_distance_matrix: dict, optional
+        actual_distance_matrix: dict, np.ndarray, optional
             A dictionary containing the distance matrix to be used to calculate
-            the driving distances. If not None, the other parameters will be ignored.
+            the driving distances, or a dense (N, N) array in the order of the
+            stops. If not None, the other parameters will be ignored.
             This can significantly speed up the calculation of the driving distances.
             The dictionary must have the following structure:
             {
@@ -436,75 +701,82 @@ class Route:
 
         if planned_distance_matrix is not None:
             # Calculate the distances using the distance matrix
-            self.planned_driving_distances = np.array(
-                list(
-                    map(
-                        self.__get_distance_from_dist_matrix,
-                        [planned_distance_matrix] * len(self.planned_sequence),
-                        self.planned_sequence,
-                    )
-                )
-            )
-
-            # Calculate remaining attributes
-            self.total_planned_driving_distance = np.nansum(
-                self.planned_driving_distances
-            )
-            self.avg_planned_driving_distance = np.nanmean(
-                self.planned_driving_distances
-            )
-            self.max_planned_driving_distance = np.nanmax(
-                self.planned_driving_distances
-            )
-            self.min_planned_driving_distance = np.nanmin(
-                self.planned_driving_distances
+            self.planned_driving_distances = self.__get_distances_from_dist_matrix(
+                planned_distance_matrix, self.planned_sequence
             )
 
         elif planned:
             self.__calculate_driving_distances(
-                [x.location for x in self.planned_sequence],
+                self.planned_sequence_coordinates,
                 "planned_driving_distances",
                 mode,
                 multiprocessing,
             )
-            self.total_planned_driving_distance = sum(self.planned_driving_distances)
+
+        if planned_distance_matrix is not None or planned:
+            # Calculate remaining attributes
+            (
+                self.total_planned_driving_distance,
+                self.avg_planned_driving_distance,
+                self.max_planned_driving_distance,
+                self.min_planned_driving_distance,
+            ) = nan_statistics(self.planned_driving_distances)
 
         if actual_distance_matrix is not None:
             # Calculate the distances using the distance matrix
-            self.actual_driving_distances = np.array(
-                list(
-                    map(
-                        self.__get_distance_from_dist_matrix,
-                        [actual_distance_matrix] * len(self.actual_sequence),
-                        self.actual_sequence,
-                    )
-                )
+            self.actual_driving_distances = self.__get_distances_from_dist_matrix(
+                actual_distance_matrix, self.actual_sequence
             )
 
         elif actual:
             self.__calculate_driving_distances(
-                [x.location for x in self.actual_sequence],
+                self.actual_sequence_coordinates,
                 "actual_driving_distances",
                 mode,
                 multiprocessing,
             )
-            self.total_actual_driving_distance = sum(self.actual_driving_distances)
+
+        if actual_distance_matrix is not None or actual:
+            # The statistics and circuity factors depend on the new distances
+            self.__invalidate("actual_driving_statistics", "actual_circuity_factors")
+
+    @cached_property
+    def actual_driving_statistics(self) -> tuple[float, float, float, float]:
+        """The (total, mean, max, min) of the actual driving distances,
+        reduced in a single pass."""
+        return nan_statistics(self.actual_driving_distances)
 
     @property
     def total_actual_driving_distance(self):
-        return np.nansum(self.actual_driving_distances)
+        return self.actual_driving_statistics[0]
 
     @property
     def avg_actual_driving_distance(self):
-        return np.nanmean(self.actual_driving_distances)
+        return self.actual_driving_statistics[1]
 
     @property
     def max_actual_driving_distance(self):
-        return np.nanmax(self.actual_driving_distances)
+        return self.actual_driving_statistics[2]
 
     @property
     def min_actual_driving_distance(self):
-        return np.nanmin(self.actual_driving_distances)
+        return self.actual_driving_statistics[3]
+
+    @staticmethod
+    def __calculate_circuity_factors(
+        driving_distances: np.ndarray, euclidean_distances: np.ndarray
+    ) -> np.ndarray:
+        """Divide the driving distances by the euclidean distances in a single
+        vectorized operation. Legs with a null euclidean distance are assigned
+        a circuity factor of 1, avoiding the division by zero.
+        """
+        driving = np.asarray(driving_distances, dtype=np.float64)
+        euclidean = np.asarray(euclidean_distances, dtype=np.float64)
+        return Route.__readonly(
+            np.divide(
+                driving, euclidean, out=np.ones_like(driving), where=euclidean != 0
+            )
+        )
 
     def evaluate_circuity_factor(self, planned: bool = True) -> None:
         """Evaluate the circuity factor of the route. It is defined as the ratio
@@ -514,37 +786,25 @@ class Route:
         """
 
         if planned:
-            # Calculate the circuity factor of the planned sequence avoiding the
-            # division by zero
-            self.planned_circuity_factors = np.array(
-                [
-                    x / y if y != 0 else 1
-                    for x, y in zip(
-                        self.planned_driving_distances, self.planned_euclidean_distances
-                    )
-                ]
+            self.planned_circuity_factors = self.__calculate_circuity_factors(
+                self.planned_driving_distances, self.planned_euclidean_distances
             )
-            # Calculate remaining attributes
-            self.max_planned_circuity_factor = np.nanmax(self.planned_circuity_factors)
-            self.min_planned_circuity_factor = np.nanmin(self.planned_circuity_factors)
+            # Calculate remaining attributes, min, median and max in one sweep
+            (
+                self.min_planned_circuity_factor,
+                self.med_planned_circuity_factor,
+                self.max_planned_circuity_factor,
+            ) = np.nanpercentile(self.planned_circuity_factors, [0, 50, 100])
             self.total_planned_circuity_factor = (
                 self.total_planned_driving_distance
                 / self.total_planned_euclidean_distance
             )
             self.avg_planned_circuity_factor = np.nanmean(self.planned_circuity_factors)
-            self.med_planned_circuity_factor = np.nanmedian(
-                self.planned_circuity_factors
-            )
 
-    @property
+    @cached_property
     def actual_circuity_factors(self):
-        return np.array(
-            [
-                x / y if y != 0 else 1
-                for x, y in zip(
-                    self.actual_driving_distances, self.actual_euclidean_distances
-                )
-            ]
+        return self.__calculate_circuity_factors(
+            self.actual_driving_distances, self.actual_euclidean_distances
         )
 
     @property
@@ -563,16 +823,40 @@ class Route:
     def total_actual_circuity_factor(self):
         return self.total_actual_driving_distance / self.total_actual_euclidean_distance
 
-    @property
-    def avg_circuity_factor_actual(self):
-        return np.nanmean(self.actual_circuity_factors)
-
     @property
     def med_actual_circuity_factor(self):
         return np.nanmedian(self.actual_circuity_factors)
 
     # Analyzing routes shape and area
 
+    @staticmethod
+    def __calculate_bbox(coords: np.ndarray) -> list[float]:
+        """Return the bounding box of the sequence as [min lat, min lon,
+        max lat, max lon], using one min and one max reduction over a (N, 2)
+        array of the stops locations.
+        """
+        (lat_min, lon_min), (lat_max, lon_max) = coords.min(axis=0), coords.max(axis=0)
+        return [lat_min, lon_min, lat_max, lon_max]
+
+    @staticmethod
+    def __calculate_bbox_area(bbox: list[float]) -> float:
+        """Calculate the area of the bounding box considering the earth a
+        sphere of radius 6371 km, the area is given in km^2. The bbox holds
+        only four scalars, so the math module is used instead of numpy.
+        """
+        lat_min, lon_min, lat_max, lon_max = map(math.radians, bbox)
+        return (
+            2
+            * 6371**2
+            * abs(math.sin(lat_max) - math.sin(lat_min))
+            * abs(lon_max - lon_min)
+        )
+
+    @staticmethod
+    def __calculate_bbox_aspect_ratio(bbox: list[float]) -> float:
+        """Ratio between the latitude and the longitude spans of the bbox."""
+        return (bbox[2] - bbox[0]) / (bbox[3] - bbox[1])
+
     def find_bbox(
         self, planned: bool = False, actual: bool = True, verbose: bool = False
     ) -> None:
@@ -582,135 +866,168 @@ class Route:
         # Find the bounding box of the route
 
         if planned:
-            try:
-                self.planned_bbox = [
-                    min(x.location[0] for x in self.planned_sequence),
-                    min(x.location[1] for x in self.planned_sequence),
-                    max(x.location[0] for x in self.planned_sequence),
-                    max(x.location[1] for x in self.planned_sequence),
-                ]
-                # Calculate the area considering the earth an sphere
-                # 6371 is the radius of the earth in km, area in km^2
-                self.planned_bbox_area = (
-                    4
-                    * np.pi
-                    * 6371**2
-                    * abs(
-                        np.sin(np.radians(self.planned_bbox[2]))
-                        - np.sin(np.radians(self.planned_bbox[0]))
-                    )
-                    * abs(
-                        np.radians(self.planned_bbox[3])
-                        - np.radians(self.planned_bbox[1])
-                    )
-                    / (2 * np.pi)
-                )
-                print("Awesome! I found the bounding box of the planned route!")
-            except AttributeError:
+            if self.planned_sequence is None:
                 warnings.warn(
                     "Could not find the bounding box of the planned sequence."
                 )
                 self.planned_bbox = None
+            else:
+                self.planned_bbox = self.__calculate_bbox(
+                    self.planned_sequence_coordinates
+                )
+                self.planned_bbox_area = self.__calculate_bbox_area(self.planned_bbox)
+                self.planned_bbox_aspect_ratio = self.__calculate_bbox_aspect_ratio(
+                    self.planned_bbox
+                )
+                if verbose:
+                    print("Awesome! I found the bounding box of the planned route!")
 
         if actual:
-            try:
-                self.actual_bbox = [
-                    min(x.location[0] for x in self.actual_sequence),  # min lat
-                    min(x.location[1] for x in self.actual_sequence),  # min lon
-                    max(x.location[0] for x in self.actual_sequence),  # max lat
-                    max(x.location[1] for x in self.actual_sequence),  # max lon
-                ]
-                # Calculate the area considering the earth a sphere
-                self.actual_bbox_area = (
-                    4
-                    * np.pi
-                    * 6371**2
-                    * abs(
-                        np.sin(np.radians(self.actual_bbox[2]))
-                        - np.sin(np.radians(self.actual_bbox[0]))
-                    )
-                    * abs(
-                        np.radians(self.actual_bbox[3])
-                        - np.radians(self.actual_bbox[1])
-                    )
-                    / (2 * np.pi)
-                )  # 6371 is the radius of the earth in km, area in km^2
-
-                self.actual_bbox_aspect_ratio = (
-                    self.actual_bbox[2] - self.actual_bbox[0]
-                ) / (self.actual_bbox[3] - self.actual_bbox[1])
+            if self.actual_sequence is None:
+                warnings.warn("Could not find the bounding box of the actual sequence.")
+                self.actual_bbox = None
+            else:
+                self.actual_bbox = self.__calculate_bbox(
+                    self.actual_sequence_coordinates
+                )
+                self.actual_bbox_area = self.__calculate_bbox_area(self.actual_bbox)
+
+                self.actual_bbox_aspect_ratio = self.__calculate_bbox_aspect_ratio(
+                    self.actual_bbox
+                )
 
                 if verbose:
                     print("Awesome! I found the bounding box of the actual sequence.")
-            except AttributeError:
-                warnings.warn("Could not find the bounding box of the actual sequence.")
-                self.actual_bbox = None
 
-    # TODO: Test!
-    # TODO: calculate max and min edge length
-    # TODO: calculate area,
-    # TODO: calculate how close to a square is the route
-    def find_minimum_rotated_rectangle(self) -> None:
+    def __set_minimum_rotated_rectangle(self, prefix: str, points: np.ndarray) -> None:
+        """Set the minimum rotated rectangle of the locations of a sequence and
+        its metrics as attributes named after the prefix. They all come from a
+        single rotating calipers pass over the vertices of the convex hull, see
+        convex_hull_vertices. One distinct location gives a Point and two or
+        more collinear ones give a LineString.
+        """
+        points = convex_hull_vertices(points)
+        match len(points):
+            case 1:
+                mrr, area, min_edge, max_edge, angle = Point(points[0]), 0, 0, 0, 0
+            case 2:
+                d_x, d_y = points[1] - points[0]
+                mrr, area, min_edge = LineString(points), 0, 0
+                max_edge = float(np.hypot(d_x, d_y))
+                angle = float(np.degrees(np.arctan2(d_y, d_x)))
+            case _:
+                corners, area, min_edge, max_edge, angle = rotating_calipers(points)
+                mrr = Polygon(corners)
+        setattr(self, f"{prefix}_mrr", mrr)
+        setattr(self, f"{prefix}_mrr_area", area)
+        setattr(self, f"{prefix}_mrr_min_edge", min_edge)
+        setattr(self, f"{prefix}_mrr_max_edge", max_edge)
+        setattr(self, f"{prefix}_mrr_angle", angle)
+        # How close to a square the route is, 1 being a perfect square
+        setattr(
+            self,
+            f"{prefix}_mrr_aspect_ratio",
+            min_edge / max_edge if max_edge > 0 else np.nan,
+        )
+
+    def find_minimum_rotated_rectangle(self, verbose: bool = False) -> None:
         """Find the minimum rotated rectangle of the route. It is defined as the
-        minimum rectangle that contains all the stops of the route.
+        minimum rectangle that contains all the stops of the route. Besides the
+        rectangle, its area, the length of its shortest and longest edges, the
+        angle of the rectangle, in degrees, and its aspect ratio (shortest over
+        longest edge) are stored for each sequence.
         """
-        try:
-            self.planned_mrr = self.minimum_rotated_rectangle(
-                [x.location for x in self.planned_sequence]
-            )
-            print(
-                "Awesome! I found the minimum rotated rectangle of the planned route!"
-            )
-        except AttributeError:
+        if self.planned_sequence is None:
             warnings.warn(
                 "Could not find the minimum rotated rectangle of the planned."
             )
             self.planned_mrr = None
-
-        try:
-            self.actual_mrr = self.minimum_rotated_rectangle(
-                [x.location for x in self.actual_sequence]
+        else:
+            self.__set_minimum_rotated_rectangle(
+                "planned", self.planned_sequence_coordinates
             )
-            self.actual_mrr_area = self.actual_mrr.area
-            self.actual_mrr_aspect_ratio = 0
-            print("Awesome! I found the minimum rotated rectangle of the actual route!")
-        except AttributeError:
+            if verbose:
+                print(
+                    "Awesome! I found the minimum rotated rectangle of the planned "
+                    "route!"
+                )
+
+        if self.actual_sequence is None:
             warnings.warn("Could not find the minimum rotated rectangle of the actual.")
             self.actual_mrr = None
+        else:
+            self.__set_minimum_rotated_rectangle(
+                "actual", self.actual_sequence_coordinates
+            )
+            if verbose:
+                print(
+                    "Awesome! I found the minimum rotated rectangle of the actual "
+                    "route!"
+                )
 
     def create_convex_hull_polygon(self) -> None:
-        """Create a polygon that represents the convex hull of the route."""
-        points = np.array([x.location for x in self.stops.values])
-        hull = ConvexHull(points)
-        self.convex_hull_coords = hull.points[hull.vertices]
-        self.convex_hull_polygon = Polygon(points[hull.vertices])
-
-    def calculate_convex_hull_polygon_area(self):
-        """Calculate the area of the convex hull polygon."""
-        try:
-            self.convex_hull_polygon_area = self.convex_hull_polygon.area
-        except AttributeError:
+        """Create the convex hull of the route. The area and the perimeter of
+        the hull are also stored, taken from the hull volume and area, which
+        are the enclosed area and the perimeter for 2D points. The shapely
+        polygon is only built when convex_hull_polygon is accessed.
+
+        The locations are deduplicated once. If they are a single point or lie
+        on a line, Qhull is skipped: the hull is the segment between the first
+        and the last of the lexicographically sorted unique locations, with
+        null area, and convex_hull is set to None. A route without stops gets
+        an empty hull, with null area and perimeter.
+        """
+        points = np.unique(self.stops_coordinates, axis=0)
+        if len(points) == 0:
+            # A route without stops has an empty hull
+            self.convex_hull = None
+            self.convex_hull_coords = points
+            self.convex_hull_polygon_area = self.convex_hull_perimeter = 0.0
+        elif len(points) < 3 or np.linalg.matrix_rank(points[1:] - points[0]) < 2:
+            self.convex_hull = None
+            self.convex_hull_coords = points[[0, -1]] if len(points) > 1 else points
+            self.convex_hull_polygon_area = 0.0
+            self.convex_hull_perimeter = 2 * float(np.hypot(*(points[-1] - points[0])))
+        else:
+            self.convex_hull = convex_hull(points)
+            self.convex_hull_coords = self.convex_hull.points[self.convex_hull.vertices]
+            self.convex_hull_polygon_area = self.convex_hull.volume
+            self.convex_hull_perimeter = self.convex_hull.area
+        self.convex_hull_mrr = self.convex_hull_mrr_area = None
+        self.__invalidate("convex_hull_polygon")
+
+    @cached_property
+    def convex_hull_polygon(self) -> Polygon:
+        """The convex hull of the route as a shapely polygon, for geometric
+        predicates such as contains or intersection. Degenerate hulls are
+        returned as a Point or a LineString."""
+        if self.convex_hull_coords is None:
+            self.create_convex_hull_polygon()
+        if len(self.convex_hull_coords) < 3:
+            return MultiPoint(self.convex_hull_coords).convex_hull
+        return Polygon(self.convex_hull_coords)
+
+    def calculate_convex_hull_polygon_area(self, verbose: bool = False):
+        """Calculate the area of the convex hull polygon. The hull is only
+        created if it was not created before.
+        """
+        if self.convex_hull_polygon_area is None:
             self.create_convex_hull_polygon()
-            self.convex_hull_polygon_area = self.convex_hull_polygon.area
-        print("Awesome! I calculated the area of the convex hull polygon!")
+        if verbose:
+            print("Awesome! I calculated the area of the convex hull polygon!")
 
     def create_location_types_dictionary(self) -> None:
         """Create two dictionaries that contain the stops separated by location
         type.
         """
-        # Create a dictionary that contains the location types of the stops
-        self.depots_dict = {}
-        self.delivery_points_dict = {}
-
-        # Iterate over the stops
-        for stop in self.stops.values():
-            if stop.location_type == "depot":
-                self.depots_dict[stop.stop_id] = stop
-            elif stop.location_type == "delivery":
-                self.delivery_points_dict[stop.stop_id] = stop
+        # Partition the stops by the location type columns of the stops status
+        stops = list(self.stops.values())
+        depots_index = np.flatnonzero(self.__stops_status["depot"])
+        delivery_index = np.flatnonzero(self.__stops_status["delivery"])
+        self.depots_dict = {stops[i].name: stops[i] for i in depots_index}
+        self.delivery_points_dict = {stops[i].name: stops[i] for i in delivery_index}
 
-        self.number_of_delivery_stops = len(self.delivery_points_dict)
-        self.number_of_depots = len(self.depots_dict)
+        self.number_of_depots = int(depots_index.size)
 
     @property
     def delivery_locations_list(self) -> list:
@@ -719,73 +1036,197 @@ class Route:
             x.location for x in self.stops.values() if x.location_type == "delivery"
         ]
 
-    # TODO: Test!
-    def calculate_route_centroid(self) -> None:
-        """Calculate the centroid of the route, providing mean coordinates and
-        its standard deviation and coefficient of variance as well.
-        """
+    @cached_property
+    def stops_coordinates(self) -> np.ndarray:
+        """The locations of all the stops as a (N, 2) array of (lat, lon), in
+        the same order as the stops dictionary, see coordinates_dtype."""
+        coordinates = np.array(
+            list(map(attrgetter("location"), self.stops.values())),
+            dtype=self.coordinates_dtype,
+        )
+        return self.__readonly(coordinates.reshape(-1, 2))
 
-        locations = self.delivery_locations_list
+    @cached_property
+    def delivery_coordinates(self) -> np.ndarray:
+        """The delivery locations as a (N, 2) array of (lat, lon),
+        selected from the stops coordinates with the delivery mask of the
+        stops status, so the geometric reductions run over contiguous memory."""
+        return self.__readonly(self.stops_coordinates[self.__stops_status["delivery"]])
 
-        try:
-            coords = np.array([[x[0], x[1]] for x in locations])
+    @cached_property
+    def depots_coordinates(self) -> np.ndarray:
+        """The depot locations as a (N, 2) array of (lat, lon), in the
+        same order as the depots dictionary."""
+        return self.__readonly(self.stops_coordinates[self.__stops_status["depot"]])
 
-            # TODO: Really actual sequence?
-            self.actual_sequence_centroid_mean = (
-                np.nanmean(coords[:, 0]),
-                np.nanmean(coords[:, 1]),
-            )
+    @cached_property
+    def depots_unit_vectors(self) -> np.ndarray:
+        """The depot locations as (N, 3) unit vectors on the sphere, in the
+        same order as the depots dictionary. They are taken from the cached
+        unit vector of each depot, so depots shared by many routes are
+        converted only once."""
+        if self.depots_dict is None:
+            self.create_location_types_dictionary()
+        vectors = np.array(
+            [depot.unit_vector for depot in self.depots_dict.values()],
+            dtype=np.float64,
+        )
+        return self.__readonly(vectors.reshape(-1, 3))
 
-            self.actual_sequence_centroid_std = (
-                np.std(coords[:, 0]),
-                np.std(coords[:, 1]),
-            )
+    @cached_property
+    def delivery_unit_vectors(self) -> np.ndarray:
+        """The delivery locations as (N, 3) unit vectors on the sphere. The
+        trigonometric functions are evaluated once per delivery point, so the
+        batch distance queries below are only multiply-adds per pair."""
+        return unit_vectors(self.delivery_coordinates)
+
+    def delivery_distances_to(self, location: tuple[float, float]) -> np.ndarray:
+        """Great circle distances, in km, from each delivery point to the given
+        (lat, lon) location, e.g. the route centroid or a depot."""
+        chords = np.linalg.norm(
+            self.delivery_unit_vectors - unit_vectors(location), axis=1
+        )
+        return haversine_from_chords(chords)
 
-            self.actual_sequence_centroid_coeff_var = (
-                self.actual_sequence_centroid_std[0]
-                / self.actual_sequence_centroid_mean[0],
-                self.actual_sequence_centroid_std[1]
-                / self.actual_sequence_centroid_mean[1],
-            )
+    @cached_property
+    def stops_distance_matrix(self) -> np.ndarray:
+        """Dense (N, N) matrix of the great circle distances, in km, between
+        all the stops, in the same order as the stops dictionary. It can be
+        passed as a distance matrix to evaluate_driving_distances."""
+        return self.__readonly(haversine_pairwise(self.stops_coordinates))
+
+    @property
+    def delivery_pairwise_distances(self) -> np.ndarray:
+        """Condensed matrix, as returned by scipy pdist, of the great circle
+        distances, in km, between all the pairs of delivery points."""
+        return haversine_pairwise(self.delivery_coordinates, condensed=True)
 
-        except Exception as e:  # pylint: disable=broad-except
-            print("Error calculating the centroid of the route: ", e)
-            print("The mean and std of the centroid are set to 0")
+    def calculate_route_centroid(self) -> None:
+        """Calculate the centroid of the route, providing mean coordinates and
+        its standard deviation and coefficient of variance as well. If the
+        route has no delivery locations, all of them are set to nan.
+        """
+        coords = self.delivery_coordinates
+
+        if len(coords) == 0:
+            warnings.warn(
+                f"The route {self.name} has no delivery locations. "
+                "The mean and std of the centroid are set to nan."
+            )
             self.actual_sequence_centroid_mean = (np.nan, np.nan)
             self.actual_sequence_centroid_std = (np.nan, np.nan)
             self.actual_sequence_centroid_coeff_var = (np.nan, np.nan)
+            return
+
+        # Reduce both columns at once, (lat, lon)
+        # TODO: Really actual sequence?
+        # The deviations reuse the mean instead of letting np.std compute
+        # it again, so the coordinates are reduced in two passes
+        mean = np.nanmean(coords, axis=0)
+        deviations = coords - mean
+        std = np.sqrt(np.nanmean(deviations * deviations, axis=0))
+
+        self.actual_sequence_centroid_mean = tuple(mean)
+        self.actual_sequence_centroid_std = tuple(std)
+        # A coordinate centered on zero has no coefficient of variance
+        self.actual_sequence_centroid_coeff_var = tuple(
+            np.divide(std, mean, out=np.full_like(std, np.nan), where=mean != 0)
+        )
 
     # TODO: Test!
     # Fit the convex hull polygon to an ellipse
     def fit_convex_hull_polygon_to_rectangle(self):
         """Fit the convex hull polygon to an ellipse."""
 
-        if not hasattr(self, "convex_hull_polygon_area"):
-            self.calculate_convex_hull_polygon_area()
-
-        if not hasattr(self, "convex_hull_polygon"):
+        if self.convex_hull_coords is None:
             self.create_convex_hull_polygon()
 
-        self.convex_hull_polygon_ellipse = (
-            self.convex_hull_polygon.minimum_rotated_rectangle
-        )
-        self.convex_hull_polygon_ellipse_area = self.convex_hull_polygon_ellipse.area
+        # The hull vertices are reused, so Qhull does not run again
+        if self.convex_hull_mrr is None:
+            if len(self.convex_hull_coords) < 3:
+                # A degenerate hull is its own rectangle
+                self.convex_hull_mrr = self.convex_hull_polygon
+                self.convex_hull_mrr_area = 0.0
+            else:
+                corners, self.convex_hull_mrr_area, *_ = rotating_calipers(
+                    self.convex_hull_coords
+                )
+                self.convex_hull_mrr = Polygon(corners)
+        self.convex_hull_polygon_ellipse = self.convex_hull_mrr
+        self.convex_hull_polygon_ellipse_area = self.convex_hull_mrr_area
         self.convex_hull_polygon_ellipse_area_ratio = (
             self.convex_hull_polygon_area / self.convex_hull_polygon_ellipse_area
+            if self.convex_hull_polygon_ellipse_area > 0
+            else np.nan
         )
 
     @property
     def distance_to_depots(self) -> dict:
-        """distance to the nearest depot as a dictionary of distances."""
+        """Haversine distance, in km, between the route centroid and each
+        depot as a dictionary of distances keyed by the depot name. See
+        calculate_distances_to_depots for the equirectangular approximation.
+        """
+        return self.calculate_distances_to_depots()
 
-        locations = self.delivery_locations_list
-        depots = locations["depot"]
+    def calculate_distances_to_depots(self, mode: str = "haversine") -> dict:
+        """Calculate the distance, in km, between the route centroid and each
+        depot. It requires the centroid to be calculated first.
 
-        # distance between centroid and each depot
-        distances = {}
-        for depot in depots.values():
-            distances[depot.stop_id] = get_distance(
-                self.actual_sequence_centroid_mean, depot.location, "haversine"
-            )
+        Parameters
+        ----------
+        mode : str, optional
+            Either "haversine", "equirectangular" or "gmaps". The
+            equirectangular approximation is cheaper and suits the depots in
+            the same city of the route, see utils.equirectangular_vector for
+            its accuracy. The "gmaps" mode
+            gives the driving distances, requested for all the depots at once
+            from the Google Maps distance matrix service. Default is
+            "haversine".
 
-        return distances
+        Returns
+        -------
+        dict
+            The distances keyed by the depot name.
+        """
+        if self.depots_dict is None:
+            self.create_location_types_dictionary()
+
+        # distance between centroid and all the depots at once
+        depots = self.depots_coordinates
+
+        match mode:
+            case "haversine":
+                chords = np.linalg.norm(
+                    self.depots_unit_vectors
+                    - unit_vectors(self.actual_sequence_centroid_mean),
+                    axis=1,
+                )
+                distances = haversine_from_chords(chords)
+            case "equirectangular":
+                distances = equirectangular_vector(
+                    *self.actual_sequence_centroid_mean, depots[:, 0], depots[:, 1]
+                )
+            case "gmaps":
+                distances = drive_distance_matrix_gmaps(
+                    [self.actual_sequence_centroid_mean], depots.tolist()
+                )[0][0]
+            case _:
+                raise ValueError(
+                    "Invalid mode, please choose either 'haversine', "
+                    "'equirectangular' or 'gmaps'"
+                )
+
+        return dict(zip(self.depots_dict.keys(), distances.tolist()))
+
+    @property
+    def nearest_depot(self) -> str:
+        """Name of the depot closest to the route centroid."""
+        distances = self.distance_to_depots
+        return min(distances, key=distances.get)
+
+    @property
+    def delivery_distances_to_nearest_depot(self) -> np.ndarray:
+        """Great circle distance, in km, from each delivery point to its
+        nearest depot, from a single cdist call over the unit vectors."""
+        chords = cdist(self.delivery_unit_vectors, self.depots_unit_vectors)
+        return haversine_from_chords(chords.min(axis=1))
@@ -1,4 +1,7 @@
+from collections import Counter
 from datetime import datetime
+from functools import cached_property
+from math import cos, radians, sin
 from typing import Tuple
 
 from lmr_analyzer.enums import LocationType
@@ -10,8 +13,26 @@ class Stop:
     Class to hold the information of a stop. A stop is a location where a
     vehicle must stop to either pick up or deliver packages. The stop can be a
     depot, a pickup location, or a delivery location.
+
+    The package aggregates are evaluated once, when the stop is created or on
+    their first access, so the packages must not be changed afterwards.
     """
 
+    # The core attributes are stored in slots for faster access. The cached
+    # properties still live in the instance __dict__.
+    __slots__ = (
+        "name",
+        "location",
+        "location_type",
+        "time_window",
+        "packages",
+        "packages_list",
+        "status_list",
+        "status_counts",
+        "status_volumes",
+        "__dict__",
+    )
+
     def __init__(
         self,
         name: str,
@@ -49,17 +70,34 @@ class Stop:
     def __initialize_packages_list(self):
         if isinstance(self.packages, dict):
             self.packages_list = list(self.packages.values())
-        elif isinstance(self.packages, list) and all(
-            isinstance(pck, Package) for pck in self.packages
-        ):
+        elif isinstance(self.packages, list):
+            # The items are validated by the single pass over the packages in
+            # __initialize_status_list
             self.packages_list = self.packages
         else:
             raise TypeError("Invalid packages type: must be a list or a dictionary.")
 
     def __initialize_status_list(self):
+        # Validate the packages and sum the volume of each status in a single
+        # pass over the packages
+        self.status_volumes: Counter[PackageStatus] = Counter()
+        for package in self.packages_list:
+            if not isinstance(package, Package):
+                raise TypeError("Invalid package: must be a Package object.")
+            self.status_volumes[package.status] += package.volume
         self.status_list: list[PackageStatus] = [
             package.status for package in self.packages_list
         ]
+        # Count every status at once, instead of one scan per status
+        self.status_counts: Counter[PackageStatus] = Counter(self.status_list)
+
+    @cached_property
+    def unit_vector(self) -> Tuple[float, float, float]:
+        """The location as a unit vector on the sphere. It is evaluated once
+        per stop, so stops shared by many routes, such as the depots, do not
+        repeat the trigonometric functions of the great circle distances."""
+        lat, lon = radians(self.location[0]), radians(self.location[1])
+        return (cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat))
 
     @property
     def delivery_time(self):
@@ -67,31 +105,32 @@ class Stop:
 
     @property
     def number_of_delivered_packages(self) -> int:
-        return self.status_list.count("delivered")
+        return self.status_counts["delivered"]
 
     @property
     def number_of_rejected_packages(self) -> int:
-        return self.status_list.count("rejected")
+        return self.status_counts["rejected"]
 
     @property
     def number_of_failed_attempted_packages(self) -> int:
-        return self.status_list.count("attempted")
+        return self.status_counts["attempted"]
 
     @property
     def number_of_to_be_delivered_packages(self) -> int:
-        return self.status_list.count("to-be-delivered")
+        return self.status_counts["to-be-delivered"]
 
     @property
     def number_of_packages(self) -> int:
         """The number of packages at the stop."""
         return len(self.packages)
 
-    @property
+    @cached_property
     def total_volume_of_packages(self) -> float:
         """The total volume of the packages at the stop."""
-        return sum(package.volume for package in self.packages_list)
+        # Every package volume was already summed into its status volume
+        return sum(self.status_volumes.values())
 
-    @property
+    @cached_property
     def average_volume_of_packages(self) -> float:
         """The average volume per package at the stop."""
         return (
@@ -103,36 +142,24 @@ class Stop:
     @property
     def total_volume_of_delivered_packages(self) -> float:
         """The total volume of the delivered packages at the stop."""
-        return sum(
-            package.volume
-            for package in self.packages_list
-            if package.status == PackageStatus.DELIVERED.value
-        )
+        return self.status_volumes[PackageStatus.DELIVERED.value]
 
     @property
     def total_volume_of_rejected_packages(self) -> float:
         """The total volume of the rejected packages at the stop."""
-        return sum(
-            package.volume
-            for package in self.packages_list
-            if package.status == "rejected"
-        )
+        return self.status_volumes["rejected"]
 
     @property
     def total_volume_of_failed_attempted_packages(self) -> float:
         """Returns the total volume of the packages at the stop."""
-        return sum(
-            package.volume
-            for package in self.packages_list
-            if package.status == "attempted"
-        )
+        return self.status_volumes["attempted"]
 
-    @property
+    @cached_property
     def total_weight_of_packages(self) -> float:
         """The total weight of the packages at the stop."""
         return sum(package.weight for package in self.packages_list)
 
-    @property
+    @cached_property
     def average_weight_of_packages(self) -> float:
         """The average weight of the packages at the stop."""
         return (
@@ -141,12 +168,12 @@ class Stop:
             else 0
         )
 
-    @property
+    @cached_property
     def total_price_of_packages(self) -> float:
         """The total price of the packages at the stop."""
         return sum(package.price for package in self.packages_list)
 
-    @property
+    @cached_property
     def average_price_of_packages(self) -> float:
         """Returns the average price of the packages at the stop."""
         return (
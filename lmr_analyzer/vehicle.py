@@ -1,4 +1,6 @@
 class Vehicle:
+    __slots__ = ("name", "capacity")
+
     def __init__(self, name: str, capacity: float):
         self.name = name
         self.capacity = capacity
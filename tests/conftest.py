@@ -5,6 +5,7 @@ import pytest
 from lmr_analyzer.bbox import BoundingBox
 from lmr_analyzer.enums import PackageStatus
 from lmr_analyzer.package import Package
+from lmr_analyzer.route import Route
 from lmr_analyzer.stop import Stop
 from lmr_analyzer.vehicle import Vehicle
 
@@ -50,3 +51,17 @@ def example_vehicle():
 @pytest.fixture
 def example_bbox():
     return BoundingBox("TestBox", 10.0, 20.0, 30.0, 40.0)
+
+
+@pytest.fixture
+def example_route(example_package_1, example_package_2) -> Route:
+    time_window = (datetime(2022, 11, 20, 10), datetime(2022, 11, 20, 12))
+    stops = [
+        Stop("depot", (0, 0), "depot", time_window, []),
+        Stop("stop_1", (0, 1), "delivery", time_window, [example_package_1]),
+        Stop("stop_2", (1, 1), "delivery", time_window, [example_package_2]),
+    ]
+    route = Route(name="example_route", stops=stops)
+    route.set_actual_sequence(["depot", "stop_1", "stop_2"])
+    route.set_planned_sequence(["depot", "stop_1", "stop_2"])
+    return route
@@ -0,0 +1,21 @@
+import pytest
+
+from lmr_analyzer.analysis import Analysis
+
+
+def test_calculate_each_route_geometry(example_route):
+    analysis = Analysis("example_analysis", [example_route])
+    analysis.calculate_each_route_geometry(max_workers=2)
+
+    assert example_route.convex_hull_polygon_area == pytest.approx(0.5)
+    assert example_route.actual_mrr_area == pytest.approx(1)
+
+
+def test_fit_each_route_convex_hull_to_rectangle(example_route):
+    analysis = Analysis("example_analysis", [example_route])
+    analysis.fit_each_route_convex_hull_to_rectangle()
+
+    # The right triangle fills half of its minimum rectangle
+    assert example_route.convex_hull_polygon_ellipse_area == pytest.approx(1)
+    assert example_route.convex_hull_mrr.area == pytest.approx(1)
+    assert analysis.convex_hull_rectangle_area_ratios.tolist() == pytest.approx([0.5])
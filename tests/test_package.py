@@ -13,3 +13,8 @@ def test_modify_status(example_package_1):
 def test_invalid_status(example_package_1):
     with pytest.raises(ValueError):
         example_package_1.modify_status("invalid status")
+
+
+def test_package_has_no_instance_dict(example_package_1):
+    assert not hasattr(example_package_1, "__dict__")
+    assert example_package_1.volume > 0
@@ -0,0 +1,470 @@
+import warnings
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from lmr_analyzer.route import Route
+from lmr_analyzer.stop import Stop
+from lmr_analyzer.utils import akl_toussaint_filter, haversine
+
+
+class TestSequences:
+    def test_set_sequence_from_names(self, example_route):
+        example_route.set_planned_sequence(["stop_2", "depot", "stop_1"])
+        assert [x.name for x in example_route.planned_sequence] == [
+            "stop_2",
+            "depot",
+            "stop_1",
+        ]
+        assert example_route.planned_sequence_names == ["stop_2", "depot", "stop_1"]
+        assert example_route.number_of_planned_stops == 3
+
+    def test_set_sequence_from_stops(self, example_route):
+        stops = list(example_route.stops.values())
+        example_route.set_actual_sequence(stops[::-1])
+        assert example_route.actual_sequence == stops[::-1]
+        np.testing.assert_array_equal(
+            example_route.actual_sequence_coordinates,
+            [x.location for x in stops[::-1]],
+        )
+
+    def test_set_mixed_sequence(self, example_route):
+        stop = example_route.stops["stop_1"]
+        with pytest.raises(ValueError):
+            example_route.set_actual_sequence([stop, "stop_2"])
+        with pytest.raises(ValueError):
+            example_route.set_planned_sequence(["depot", stop])
+
+    def test_sequence_adherence(self, example_route):
+        example_route.set_actual_sequence(["depot", "stop_2"])
+        assert example_route.number_of_planned_stops_not_in_actual_sequence == 1
+        assert example_route.number_of_actual_stops_not_in_planned_sequence == 0
+        example_route.evaluate_sequence_adherence()
+        assert example_route.sequence_adherence == pytest.approx(2 / 3)
+
+        # Stops visited twice are counted once
+        example_route.set_actual_sequence(["stop_2", "depot", "stop_2"])
+        assert example_route.number_of_planned_stops_not_in_actual_sequence == 1
+        assert example_route.number_of_actual_stops_not_in_planned_sequence == 0
+
+    def test_set_invalid_sequence(self, example_route):
+        with pytest.raises(ValueError):
+            example_route.set_actual_sequence([1, 2, 3])
+
+
+class TestRouteStatus:
+    def test_route_status_dict(self, example_route):
+        status = example_route.route_status_dict
+        assert status["number_of_packages"] == 2
+        assert status["number_of_delivery_stops"] == 2
+        assert status["number_of_pickup_stops"] == 0
+        assert status["number_of_delivered_packages"] == 2
+        assert status["number_of_rejected_packages"] == 0
+        assert status["number_of_failed_attempted_packages"] == 0
+        assert status["avg_packages_per_stop"] == 1
+
+    def test_route_status_without_stops(self):
+        route = Route(name="empty", stops=[])
+        assert route.number_of_packages == 0
+        with pytest.warns(UserWarning):
+            assert route.avg_packages_per_stop == 0
+
+
+class TestDistancesCache:
+    @patch("lmr_analyzer.route.haversine_sequence", return_value=np.ones(3))
+    def test_euclidean_distances_are_cached(self, mock_haversine, example_route):
+        distances = example_route.actual_euclidean_distances
+        calls = mock_haversine.call_count
+
+        # Setting the same sequence again must not trigger a new calculation
+        example_route.set_actual_sequence(["depot", "stop_1", "stop_2"])
+        assert example_route.actual_euclidean_distances is distances
+        assert mock_haversine.call_count == calls
+
+    def test_cached_arrays_are_readonly(self, example_route):
+        example_route.evaluate_driving_distances(mode="haversine")
+        arrays = (
+            example_route.actual_sequence_coordinates,
+            example_route.actual_euclidean_distances,
+            example_route.actual_driving_distances,
+            example_route.actual_circuity_factors,
+            example_route.delivery_coordinates,
+        )
+        for array in arrays:
+            with pytest.raises(ValueError):
+                array[0] = 0
+
+    @patch("lmr_analyzer.route.haversine_sequence", return_value=np.ones(1))
+    def test_cache_disabled(self, mock_haversine, example_stop):
+        route = Route(name="no_cache", stops=[example_stop], cache=False)
+        route.set_actual_sequence([example_stop])
+        route.actual_euclidean_distances
+        route.set_actual_sequence([example_stop])
+        route.actual_euclidean_distances
+        assert mock_haversine.call_count == 2
+
+    def test_new_sequence_invalidates_distances(self, example_route):
+        distances = example_route.actual_euclidean_distances
+        example_route.set_actual_sequence(["depot", "stop_2", "stop_1"])
+        assert example_route.actual_euclidean_distances is not distances
+
+
+class TestDrivingDistances:
+    def test_planned_driving_distances_from_matrix(self, example_route):
+        distance_matrix = {
+            "example_route": {
+                "depot": {"distance_to_next(km)": 1.0},
+                "stop_1": {"distance_to_next(km)": 3.0},
+            }
+        }
+        example_route.evaluate_driving_distances(
+            planned=False, actual=False, planned_distance_matrix=distance_matrix
+        )
+
+        assert np.isnan(example_route.planned_driving_distances[2])
+        assert example_route.total_planned_driving_distance == 4.0
+        assert example_route.avg_planned_driving_distance == 2.0
+        assert example_route.max_planned_driving_distance == 3.0
+        assert example_route.min_planned_driving_distance == 1.0
+
+    def test_actual_driving_distances_from_csv_matrix(self, example_route):
+        # The matrices loaded from csv files hold the distances as strings
+        distance_matrix = {
+            "example_route": {
+                "depot": {"distance_to_next(km)": "1.5"},
+                "stop_1": {"distance_to_next(km)": "2.5"},
+                "stop_2": {"distance_to_next(km)": "3.0"},
+            }
+        }
+        example_route.evaluate_driving_distances(
+            actual=False, actual_distance_matrix=distance_matrix
+        )
+
+        assert example_route.actual_driving_distances.tolist() == [1.5, 2.5, 3.0]
+        assert example_route.total_actual_driving_distance == 7.0
+        assert example_route.max_actual_driving_distance == 3.0
+
+        # A new evaluation replaces the cached statistics
+        distance_matrix["example_route"]["depot"]["distance_to_next(km)"] = "nan"
+        example_route.evaluate_driving_distances(
+            actual=False, actual_distance_matrix=distance_matrix
+        )
+        assert example_route.total_actual_driving_distance == 5.5
+        assert example_route.min_actual_driving_distance == 2.5
+
+    def test_actual_driving_distances_from_dense_matrix(self, example_route):
+        matrix = example_route.stops_distance_matrix
+        assert matrix.shape == (3, 3)
+        assert np.allclose(matrix, matrix.T)
+        assert np.allclose(np.diag(matrix), 0)
+
+        example_route.evaluate_driving_distances(
+            actual=False, actual_distance_matrix=matrix
+        )
+        assert np.allclose(
+            example_route.actual_driving_distances,
+            example_route.actual_euclidean_distances,
+        )
+
+    @patch("lmr_analyzer.route.get_distance", return_value=(2.0, 5.0))
+    def test_actual_driving_distances(self, mock_get_distance, example_route):
+        example_route.evaluate_driving_distances(actual=True, mode="osmnx")
+
+        assert isinstance(example_route.actual_driving_distances, np.ndarray)
+        assert np.array_equal(example_route.actual_driving_distances, [2.0, 2.0, 2.0])
+        assert example_route.total_actual_driving_distance == 6.0
+        # The last leg goes back from the last stop to the first one
+        last_call = mock_get_distance.call_args_list[-1]
+        assert last_call.args[:2] == ((1, 1), (0, 0))
+
+    @patch("lmr_analyzer.route.get_distance", return_value=(2.0, 5.0))
+    def test_concurrent_driving_distances(self, mock_get_distance, example_route):
+        example_route.evaluate_driving_distances(
+            actual=True, mode="osmnx", multiprocessing=True
+        )
+
+        assert np.array_equal(example_route.actual_driving_distances, [2.0, 2.0, 2.0])
+        assert mock_get_distance.call_count == 3
+
+    @patch("lmr_analyzer.route.get_distance")
+    def test_haversine_driving_distances(self, mock_get_distance, example_route):
+        example_route.evaluate_driving_distances(actual=True, mode="haversine")
+
+        mock_get_distance.assert_not_called()
+        np.testing.assert_allclose(
+            example_route.actual_driving_distances,
+            example_route.actual_euclidean_distances,
+        )
+
+    @patch("lmr_analyzer.route.OSRM_MAX_ROUTE_SIZE", 3)
+    @patch("lmr_analyzer.route.drive_distance_legs_osm")
+    def test_actual_driving_distances_osm(self, mock_legs, example_route):
+        # Each leg distance is the position of its origin in the window + 1
+        mock_legs.side_effect = lambda window, session: (
+            np.arange(1.0, len(window)),
+            None,
+        )
+        example_route.evaluate_driving_distances(actual=True, mode="osm")
+
+        # Three legs split into windows of three and two locations
+        assert mock_legs.call_count == 2
+        assert mock_legs.call_args_list[1].args[0] == [(1, 1), (0, 0)]
+        assert np.array_equal(example_route.actual_driving_distances, [1, 2, 1])
+
+    @patch("lmr_analyzer.route.drive_distance_table_osm")
+    @patch("lmr_analyzer.route.drive_distance_legs_osm", side_effect=RuntimeError)
+    def test_actual_driving_distances_osm_table_fallback(
+        self, mock_legs, mock_table, example_route
+    ):
+        # Distance between locations i and j is 10 * i + j
+        def table(window, session):
+            indices = np.arange(len(window))
+            return (10.0 * indices[:, None] + indices[None, :], None)
+
+        mock_table.side_effect = table
+        example_route.evaluate_driving_distances(actual=True, mode="osm")
+
+        assert mock_legs.call_count == mock_table.call_count == 1
+        assert np.array_equal(example_route.actual_driving_distances, [1, 12, 23])
+
+
+class TestCircuityFactor:
+    def test_planned_circuity_factor(self, example_route):
+        euclidean = example_route.planned_euclidean_distances
+        example_route.planned_driving_distances = euclidean * 2
+        example_route.total_planned_driving_distance = np.sum(euclidean * 2)
+        example_route.evaluate_circuity_factor(planned=True)
+
+        assert np.allclose(example_route.planned_circuity_factors, 2)
+        assert example_route.min_planned_circuity_factor == pytest.approx(2)
+        assert example_route.med_planned_circuity_factor == pytest.approx(2)
+        assert example_route.max_planned_circuity_factor == pytest.approx(2)
+        assert example_route.avg_planned_circuity_factor == pytest.approx(2)
+        assert example_route.total_planned_circuity_factor == pytest.approx(2)
+
+    def test_actual_circuity_factor_zero_euclidean_distance(self, example_route):
+        example_route.actual_euclidean_distances = np.array([0.0, 1.0, 2.0])
+        example_route.actual_driving_distances = np.array([0.5, 3.0, 2.0])
+
+        assert np.array_equal(example_route.actual_circuity_factors, [1.0, 3.0, 1.0])
+        assert example_route.max_actual_circuity_factor == 3.0
+        assert example_route.min_actual_circuity_factor == 1.0
+        assert example_route.med_actual_circuity_factor == 1.0
+        assert example_route.mean_actual_circuity_factor == pytest.approx(5 / 3)
+
+    def test_actual_circuity_factors_are_cached(self, example_route):
+        example_route.evaluate_driving_distances(actual=True, mode="haversine")
+        factors = example_route.actual_circuity_factors
+        assert example_route.actual_circuity_factors is factors
+        # Setting a new sequence invalidates the cached factors
+        example_route.set_actual_sequence(["depot", "stop_2"])
+        assert "actual_circuity_factors" not in example_route.__dict__
+
+
+class TestBoundingBox:
+    def test_find_bbox(self, example_route):
+        example_route.find_bbox(planned=True, actual=True)
+
+        assert example_route.actual_bbox == [0, 0, 1, 1]
+        assert example_route.planned_bbox == [0, 0, 1, 1]
+        assert example_route.actual_bbox_aspect_ratio == 1
+        assert example_route.planned_bbox_aspect_ratio == 1
+
+    def test_find_bbox_without_sequence(self, example_route):
+        route = Route("no_sequence", list(example_route.stops.values()))
+        with pytest.warns(UserWarning):
+            route.find_bbox(planned=True, actual=True)
+        assert route.planned_bbox is None
+        assert route.actual_bbox is None
+
+
+def test_route_core_attributes_are_slots(example_route):
+    assert "name" not in example_route.__dict__
+    assert "actual_sequence" not in example_route.__dict__
+    assert example_route.name == "example_route"
+
+
+def test_stops_cache_is_reset(example_route):
+    assert example_route.number_of_packages == 2
+    assert example_route.number_of_delivery_stops == 2
+    assert len(example_route.delivery_coordinates) == 2
+    example_route.create_location_types_dictionary()
+    example_route.calculate_convex_hull_polygon_area()
+
+    # Changing the stops dictionary in place requires an explicit reset
+    del example_route.stops["stop_2"]
+    example_route.reset_stops_cache()
+    assert example_route.number_of_stops == 2
+    assert example_route.number_of_packages == 1
+    assert example_route.number_of_delivery_stops == 1
+    assert len(example_route.delivery_coordinates) == 1
+    assert example_route.depots_dict is None
+    assert example_route.convex_hull_polygon_area is None
+
+    # Assigning the stops resets the cache
+    example_route.stops = [example_route.stops["depot"]]
+    assert example_route.stops_names == ["depot"]
+    assert example_route.number_of_packages == 0
+    assert example_route.number_of_delivery_stops == 0
+
+
+class TestConvexHull:
+    def test_convex_hull_polygon_area(self, example_route):
+        example_route.calculate_convex_hull_polygon_area()
+        assert example_route.convex_hull_polygon_area == pytest.approx(0.5)
+        assert example_route.convex_hull_polygon.area == pytest.approx(0.5)
+        assert len(example_route.convex_hull_coords) == 3
+        assert example_route.convex_hull_perimeter == pytest.approx(2 + 2**0.5)
+
+    @patch("lmr_analyzer.utils.akl_toussaint_filter", wraps=akl_toussaint_filter)
+    @patch("lmr_analyzer.utils.AKL_TOUSSAINT_MIN_POINTS", 0)
+    def test_convex_hull_with_akl_toussaint_filter(self, mock_filter, example_route):
+        example_route.create_convex_hull_polygon()
+        assert mock_filter.call_count == 1
+        assert example_route.convex_hull_polygon_area == pytest.approx(0.5)
+        assert len(example_route.convex_hull_coords) == 3
+
+    def test_collinear_convex_hull(self, example_route):
+        stops = list(example_route.stops.values())
+        # Two stops at the same place and a third one on the same meridian
+        stops[1].location, stops[2].location = (0, 0), (2, 0)
+        route = Route("collinear", stops)
+        route.create_convex_hull_polygon()
+        assert route.convex_hull is None
+        assert route.convex_hull_polygon_area == 0
+        assert route.convex_hull_perimeter == pytest.approx(4)
+        assert route.convex_hull_polygon.geom_type == "LineString"
+        route.fit_convex_hull_polygon_to_rectangle()
+        assert np.isnan(route.convex_hull_polygon_ellipse_area_ratio)
+
+    def test_empty_route_convex_hull(self):
+        route = Route("empty", [])
+        route.create_convex_hull_polygon()
+        assert route.convex_hull is None
+        assert route.convex_hull_coords.shape == (0, 2)
+        assert route.convex_hull_polygon_area == 0
+        assert route.convex_hull_perimeter == 0
+        assert route.convex_hull_polygon.is_empty
+
+    def test_fit_convex_hull_polygon_to_rectangle(self, example_route):
+        example_route.fit_convex_hull_polygon_to_rectangle()
+        assert example_route.convex_hull_polygon_ellipse_area == pytest.approx(1)
+        assert example_route.convex_hull_polygon_ellipse_area_ratio == pytest.approx(
+            0.5
+        )
+
+    def test_minimum_rotated_rectangle_of_two_stops(self, example_route):
+        example_route.set_actual_sequence(["depot", "stop_2"])
+        example_route.find_minimum_rotated_rectangle()
+        assert example_route.actual_mrr.geom_type == "LineString"
+        assert example_route.actual_mrr_area == 0
+        assert example_route.actual_mrr_max_edge == pytest.approx(2**0.5)
+        assert example_route.actual_mrr_angle == pytest.approx(45)
+
+    def test_find_minimum_rotated_rectangle(self, example_route):
+        example_route.find_minimum_rotated_rectangle()
+        assert example_route.planned_mrr.area == pytest.approx(1)
+        assert example_route.actual_mrr_area == pytest.approx(1)
+        # Ties with the rectangle along the hypotenuse, sqrt(2) by sqrt(2) / 2
+        route = example_route
+        assert route.actual_mrr_min_edge * route.actual_mrr_max_edge == pytest.approx(
+            route.actual_mrr_area
+        )
+        assert route.actual_mrr_aspect_ratio == pytest.approx(
+            route.actual_mrr_min_edge / route.actual_mrr_max_edge
+        )
+
+
+class TestCentroid:
+    def test_calculate_route_centroid(self, example_route):
+        example_route.calculate_route_centroid()
+        assert example_route.actual_sequence_centroid_mean == (0.5, 1.0)
+        assert example_route.actual_sequence_centroid_std == (0.5, 0.0)
+        assert example_route.actual_sequence_centroid_coeff_var == (1.0, 0.0)
+
+    def test_calculate_route_centroid_on_the_equator(self, example_route):
+        time_window = example_route.stops["depot"].time_window
+        stops = [
+            Stop("stop_a", (-1, 1), "delivery", time_window, []),
+            Stop("stop_b", (1, 3), "delivery", time_window, []),
+        ]
+        route = Route("equator", stops)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            route.calculate_route_centroid()
+        assert route.actual_sequence_centroid_mean == (0.0, 2.0)
+        assert np.isnan(route.actual_sequence_centroid_coeff_var[0])
+        assert route.actual_sequence_centroid_coeff_var[1] == 0.5
+
+    def test_calculate_route_centroid_without_deliveries(self, example_route):
+        route = Route("depot_only", [example_route.stops["depot"]])
+        with pytest.warns(UserWarning):
+            route.calculate_route_centroid()
+        assert np.isnan(route.actual_sequence_centroid_mean).all()
+
+    def test_float32_coordinates(self, example_route, monkeypatch):
+        monkeypatch.setattr(Route, "coordinates_dtype", np.float32)
+        example_route.set_actual_sequence(["depot", "stop_1", "stop_2"])
+        assert example_route.actual_sequence_coordinates.dtype == np.float32
+        assert example_route.delivery_coordinates.dtype == np.float32
+        example_route.calculate_route_centroid()
+        assert example_route.actual_sequence_centroid_mean == (0.5, 1.0)
+
+    def test_delivery_coordinates(self, example_route):
+        coords = example_route.delivery_coordinates
+        assert coords.shape == (2, 2)
+        assert coords.dtype == np.float64
+        assert example_route.stops_coordinates.shape == (3, 2)
+        np.testing.assert_array_equal(coords, example_route.delivery_locations_list)
+
+
+class TestDeliveryDistances:
+    def test_delivery_distances_to(self, example_route):
+        distances = example_route.delivery_distances_to((0, 0))
+        expected = [haversine(0, 1, 0, 0), haversine(1, 1, 0, 0)]
+        np.testing.assert_allclose(distances, expected)
+
+    def test_delivery_pairwise_distances(self, example_route):
+        distances = example_route.delivery_pairwise_distances
+        np.testing.assert_allclose(distances, [haversine(0, 1, 1, 1)])
+
+
+class TestLocationTypes:
+    def test_create_location_types_dictionary(self, example_route):
+        example_route.create_location_types_dictionary()
+        assert list(example_route.depots_dict) == ["depot"]
+        assert list(example_route.delivery_points_dict) == ["stop_1", "stop_2"]
+        assert example_route.number_of_depots == 1
+        assert isinstance(example_route.number_of_depots, int)
+
+    def test_distance_to_depots(self, example_route):
+        example_route.calculate_route_centroid()
+        distances = example_route.distance_to_depots
+        assert list(distances) == ["depot"]
+        assert distances["depot"] == pytest.approx(haversine(0, 0, 0.5, 1))
+        assert example_route.nearest_depot == "depot"
+
+    def test_delivery_distances_to_nearest_depot(self, example_route):
+        distances = example_route.delivery_distances_to_nearest_depot
+        expected = [haversine(0, 1, 0, 0), haversine(1, 1, 0, 0)]
+        np.testing.assert_allclose(distances, expected)
+
+    def test_distance_to_depots_equirectangular(self, example_route):
+        example_route.calculate_route_centroid()
+        distances = example_route.calculate_distances_to_depots("equirectangular")
+        assert distances["depot"] == pytest.approx(haversine(0, 0, 0.5, 1), 1e-3)
+
+    @patch("lmr_analyzer.route.drive_distance_matrix_gmaps")
+    def test_distance_to_depots_gmaps(self, mock_matrix, example_route):
+        mock_matrix.return_value = (np.array([[3.5]]), np.array([[7.0]]))
+        example_route.calculate_route_centroid()
+        distances = example_route.calculate_distances_to_depots("gmaps")
+
+        assert distances == {"depot": 3.5}
+        assert mock_matrix.call_args.args == ([(0.5, 1.0)], [[0.0, 0.0]])
+
+    def test_distance_to_depots_invalid_mode(self, example_route):
+        example_route.calculate_route_centroid()
+        with pytest.raises(ValueError):
+            example_route.calculate_distances_to_depots("invalid_mode")
@@ -1,5 +1,9 @@
 from datetime import datetime
 
+import pytest
+
+from lmr_analyzer.enums import PackageStatus
+from lmr_analyzer.package import Package
 from lmr_analyzer.stop import Stop
 
 
@@ -71,3 +75,45 @@ class TestStopProperties:
 
     def test_average_volume_of_packages(self, example_stop):
         assert example_stop.average_volume_of_packages == 1
+
+    def test_status_counts(self, example_stop, example_package_1):
+        rejected = Package(
+            name="package_3",
+            dimensions=(1, 1, 1),
+            status=PackageStatus.REJECTED.value,
+            weight=0.5,
+            price=10,
+        )
+        stop = Stop(
+            name="mixed_stop",
+            location=(0, 0),
+            location_type="delivery",
+            time_window=example_stop.time_window,
+            packages=[example_package_1, rejected, rejected],
+        )
+        assert stop.status_counts == {"delivered": 1, "rejected": 2}
+        assert stop.number_of_rejected_packages == 2
+        assert stop.number_of_failed_attempted_packages == 0
+        assert stop.total_volume_of_rejected_packages == 2
+        assert stop.total_volume_of_delivered_packages == 1
+
+    def test_unit_vector(self, example_stop):
+        assert example_stop.unit_vector == (1.0, 0.0, 0.0)
+        # It is evaluated only once
+        assert example_stop.unit_vector is example_stop.unit_vector
+
+    def test_invalid_packages(self, example_stop, example_package_1):
+        with pytest.raises(TypeError):
+            Stop(
+                name="invalid_stop",
+                location=(0, 0),
+                location_type="delivery",
+                time_window=example_stop.time_window,
+                packages=[example_package_1, "package_2"],
+            )
+
+
+def test_stop_core_attributes_are_slots(example_stop):
+    assert "location" not in example_stop.__dict__
+    assert "status_counts" not in example_stop.__dict__
+    assert example_stop.location == (0, 0)
@@ -1,9 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
 
+import numpy as np
 import pytest
 import requests
+from scipy.spatial import ConvexHull
 
-from lmr_analyzer.utils import drive_distance_osm, get_distance, haversine
+from lmr_analyzer.utils import (
+    HTTP_SESSION,
+    REQUESTS_TIMEOUT,
+    STOP_NAME_IDS,
+    akl_toussaint_filter,
+    clear_requests_cache,
+    drive_distance_legs_osm,
+    drive_distance_matrix_gmaps,
+    drive_distance_matrix_osm,
+    drive_distance_osm,
+    drive_distance_osmnx,
+    drive_distance_osmnx_many,
+    drive_distance_table_osm,
+    equirectangular,
+    equirectangular_pairwise,
+    equirectangular_vector,
+    get_city_state_names,
+    get_distance,
+    get_distances,
+    haversine,
+    haversine_from_chords,
+    haversine_matrix,
+    haversine_pairwise,
+    haversine_sequence,
+    haversine_vector,
+    hull_minimum_rotated_rectangle,
+    intern_name,
+    minimum_rotated_rectangle,
+    nan_statistics,
+    rotating_calipers,
+    unit_vectors,
+)
 
 
 class TestHaversine:
@@ -29,6 +63,131 @@ class TestHaversine:
         assert pytest.approx(haversine(90, 0, -90, 0), 0.1) == 20015
 
 
+class TestHaversineVector:
+    def test_haversine_vector_matches_scalar(self):
+        lats, lons = np.array([0, 34.0522, -90]), np.array([1, -118.2437, 0])
+        distances = haversine_vector(40.7128, -74.0060, lats, lons)
+        expected = [
+            haversine(40.7128, -74.0060, lat, lon) for lat, lon in zip(lats, lons)
+        ]
+        assert np.allclose(distances, expected)
+
+
+def test_equirectangular_vector_close_to_haversine():
+    # Points within a city, around Seattle
+    lats, lons = np.array([47.60, 47.70, 47.55]), np.array([-122.30, -122.35, -122.25])
+    distances = equirectangular_vector(47.62, -122.33, lats, lons)
+    expected = haversine_vector(47.62, -122.33, lats, lons)
+    assert np.allclose(distances, expected, rtol=1e-3)
+
+
+class TestHaversineSequence:
+    def test_haversine_sequence(self):
+        coords = [(40.7128, -74.0060), (34.0522, -118.2437), (0, 0)]
+        expected = [
+            haversine(*coords[0], *coords[1]),
+            haversine(*coords[1], *coords[2]),
+            haversine(*coords[2], *coords[0]),
+        ]
+        assert np.allclose(haversine_sequence(coords), expected)
+
+    def test_haversine_sequence_single_point(self):
+        assert np.array_equal(haversine_sequence([(10, 10)]), [0])
+
+    def test_haversine_from_chords(self):
+        coords = [(40.7128, -74.0060), (34.0522, -118.2437)]
+        vectors = unit_vectors(coords)
+        assert np.allclose(np.linalg.norm(vectors, axis=1), 1)
+        chord = np.linalg.norm(vectors[0] - vectors[1])
+        assert haversine_from_chords(chord) == pytest.approx(
+            haversine(*coords[0], *coords[1])
+        )
+
+
+def test_equirectangular_pairwise():
+    coords = np.array([(-3.7319, -38.5267), (-3.8, -38.45), (-3.75, -38.6)])
+    expected = haversine_pairwise(coords)
+
+    matrix = equirectangular_pairwise(coords)
+    assert matrix.shape == (3, 3)
+    assert np.allclose(matrix, expected, rtol=1e-3)
+    condensed = equirectangular_pairwise(coords, condensed=True)
+    assert np.allclose(condensed, [matrix[0, 1], matrix[0, 2], matrix[1, 2]])
+
+
+def test_haversine_matrix():
+    coords_a = np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 1.0]])
+    coords_b = np.array([[-3.7, -38.5], [0.0, 0.0]])
+    matrix = haversine_matrix(coords_a, coords_b)
+
+    assert matrix.shape == (3, 2)
+    for i in range(3):
+        for j in range(2):
+            expected = haversine(*coords_a[i], *coords_b[j])
+            assert matrix[i, j] == pytest.approx(expected)
+
+
+def test_haversine_pairwise():
+    coords = np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 1.0], [-3.7, -38.5]])
+    matrix = haversine_pairwise(coords)
+
+    assert matrix.shape == (4, 4)
+    assert np.allclose(np.diag(matrix), 0)
+    for i, j in [(0, 1), (1, 2), (0, 3), (2, 3)]:
+        expected = haversine(*coords[i], *coords[j])
+        assert matrix[i, j] == pytest.approx(expected)
+        assert matrix[j, i] == pytest.approx(expected)
+
+    condensed = haversine_pairwise(coords, condensed=True)
+    assert condensed.shape == (6,)
+    assert condensed[0] == pytest.approx(matrix[0, 1])
+
+
+@patch("requests.Session.get")
+def test_get_city_state_names_is_memoized(mock_get):
+    clear_requests_cache()
+    mock_get.return_value.json.return_value = {
+        "address": {"county": "Fortaleza", "state": "Ceará"}
+    }
+
+    assert get_city_state_names((-3.7319, -38.5267)) == ("Fortaleza", "Ceará")
+    assert get_city_state_names((-3.73190001, -38.5267)) == ("Fortaleza", "Ceará")
+    assert mock_get.call_count == 1
+    # The names are memoized regardless of the session used to request them
+    assert get_city_state_names((-3.7319, -38.5267), requests.Session()) == (
+        "Fortaleza",
+        "Ceará",
+    )
+    assert mock_get.call_count == 1
+    clear_requests_cache()
+
+
+def test_intern_name():
+    assert intern_name("interned_stop") == intern_name("interned_stop")
+    assert intern_name("interned_stop") != intern_name("another_interned_stop")
+
+
+def test_intern_name_is_thread_safe():
+    names = [f"concurrent_stop_{i}" for i in range(2000)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        ids = list(executor.map(intern_name, names * 4))
+
+    assert ids == [intern_name(name) for name in names * 4]
+    assert len(set(ids)) == len(names)
+    assert len(set(STOP_NAME_IDS.values())) == len(STOP_NAME_IDS)
+
+
+def test_http_session_identifies_the_package():
+    assert HTTP_SESSION.headers["User-Agent"].startswith("lmr_analyzer/")
+    assert "gzip" in HTTP_SESSION.headers["Accept-Encoding"]
+
+
+def test_http_session_retries_transient_errors():
+    adapter = HTTP_SESSION.get_adapter("http://router.project-osrm.org")
+    assert adapter.max_retries.total == 3
+    assert 503 in adapter.max_retries.status_forcelist
+
+
 class TestDriveDistanceOSM:
     @patch("requests.Session.get")
     def test_drive_distance_osm_success(self, mock_get):
@@ -69,7 +228,185 @@ class TestDriveDistanceOSM:
             drive_distance_osm(origin, destination)
 
 
+@patch("lmr_analyzer.utils.nx.bidirectional_dijkstra", return_value=(1500.0, []))
+@patch(
+    "osmnx.distance.nearest_nodes",
+    side_effect=lambda graph, X, Y: np.arange(len(X)),
+)
+@patch("osmnx.graph_from_bbox")
+def test_drive_distance_osmnx_reuses_tile_graph(mock_graph, *_):
+    clear_requests_cache()
+
+    assert drive_distance_osmnx((-3.731, -38.526), (-3.735, -38.521)) == 1.5
+    assert drive_distance_osmnx((-3.712, -38.541), (-3.709, -38.538)) == 1.5
+    mock_graph.assert_called_once()
+    west, south, east, north = mock_graph.call_args.kwargs["bbox"]
+    assert west <= -38.541 and east >= -38.521
+    assert south <= -3.735 and north >= -3.709
+    clear_requests_cache()
+
+
+@patch("lmr_analyzer.utils.nx.bidirectional_dijkstra")
+@patch(
+    "osmnx.distance.nearest_nodes",
+    side_effect=lambda graph, X, Y: np.arange(len(X)),
+)
+@patch("osmnx.graph_from_bbox")
+def test_drive_distance_osmnx_many(mock_graph, mock_nearest, mock_path):
+    clear_requests_cache()
+    mock_path.side_effect = lambda graph, source, target, **_: (1000.0 * target, [])
+    pairs = [((-3.731, -38.526), (-3.735, -38.521)), ((-3.712, -38.541), (0, 0))]
+
+    assert np.allclose(drive_distance_osmnx_many(pairs), [1.0, 3.0])
+    mock_graph.assert_called_once()
+    mock_nearest.assert_called_once()
+    assert np.allclose(mock_nearest.call_args.kwargs["Y"], [-3.731, -3.735, -3.712, 0])
+    clear_requests_cache()
+
+
+@patch("lmr_analyzer.utils.nx.single_source_dijkstra_path_length")
+@patch("lmr_analyzer.utils.nx.bidirectional_dijkstra")
+@patch(
+    "osmnx.distance.nearest_nodes",
+    side_effect=lambda graph, X, Y: np.array([0, 1, 0, 2, 3, 4]),
+)
+@patch("osmnx.graph_from_bbox")
+def test_drive_distance_osmnx_many_shares_origins(
+    mock_graph, mock_nearest, mock_path, mock_single_source
+):
+    clear_requests_cache()
+    mock_path.return_value = (500.0, [])
+    mock_single_source.return_value = {0: 0.0, 1: 1000.0, 2: 2000.0}
+    origin = (-3.731, -38.526)
+    pairs = [
+        (origin, (-3.735, -38.521)),
+        (origin, (-3.73, -38.52)),
+        ((-3.72, -38.53), (-3.71, -38.54)),
+    ]
+
+    assert np.allclose(drive_distance_osmnx_many(pairs), [1.0, 2.0, 0.5])
+    mock_single_source.assert_called_once()
+    mock_path.assert_called_once()
+    # The lengths from the shared origin are reused by the next calls
+    assert np.allclose(drive_distance_osmnx_many(pairs), [1.0, 2.0, 0.5])
+    mock_single_source.assert_called_once()
+    clear_requests_cache()
+
+
+class TestDriveDistanceTableOSM:
+    @patch("requests.Session.get")
+    def test_drive_distance_table_osm(self, mock_get):
+        mock_response = Mock()
+        mock_response.json.return_value = {
+            "code": "Ok",
+            "distances": [[0, 1000], [2000, None]],
+            "durations": [[0, 60], [120, None]],
+        }
+        mock_get.return_value = mock_response
+
+        distances, durations = drive_distance_table_osm([(1, 2), (3, 4)])
+
+        assert mock_get.call_count == 1
+        assert "2,1;4,3" in mock_get.call_args.args[0]
+        assert mock_get.call_args.kwargs["timeout"] == REQUESTS_TIMEOUT
+        assert np.array_equal(distances[0], [0, 1])
+        assert distances[1, 0] == 2
+        assert np.isnan(distances[1, 1])
+        assert np.array_equal(durations[0], [0, 1])
+
+
+class TestDriveDistanceMatrixOSM:
+    @patch("requests.Session.get")
+    def test_drive_distance_matrix_osm(self, mock_get):
+        mock_response = Mock()
+        mock_response.json.return_value = {
+            "code": "Ok",
+            "distances": [[1000, 2000, None], [3000, 4000, 5000]],
+            "durations": [[60, 120, None], [180, 240, 300]],
+        }
+        mock_get.return_value = mock_response
+
+        distances, durations = drive_distance_matrix_osm(
+            [(1, 2), (3, 4)], [(5, 6), (7, 8), (9, 10)]
+        )
+
+        assert mock_get.call_count == 1
+        url = mock_get.call_args.args[0]
+        assert "2,1;4,3;6,5;8,7;10,9" in url
+        assert "sources=0;1&destinations=2;3;4" in url
+        assert distances.shape == (2, 3)
+        assert np.array_equal(distances[1], [3, 4, 5])
+        assert np.isnan(distances[0, 2])
+        assert np.array_equal(durations[1], [3, 4, 5])
+
+
+class TestDriveDistanceLegsOSM:
+    @patch("requests.Session.get")
+    def test_drive_distance_legs_osm(self, mock_get):
+        mock_response = Mock()
+        mock_response.json.return_value = {
+            "code": "Ok",
+            "routes": [
+                {
+                    "legs": [
+                        {"distance": 1000, "duration": 60},
+                        {"distance": 2500, "duration": 90},
+                    ]
+                }
+            ],
+        }
+        mock_get.return_value = mock_response
+
+        distances, durations = drive_distance_legs_osm([(1, 2), (3, 4), (5, 6)])
+
+        assert mock_get.call_count == 1
+        assert "/route/v1/driving/2,1;4,3;6,5" in mock_get.call_args.args[0]
+        assert np.array_equal(distances, [1, 2.5])
+        assert np.array_equal(durations, [1, 1.5])
+
+
+class TestDriveDistanceMatrixGmaps:
+    @patch("lmr_analyzer.utils.GMAPS_MAX_MATRIX_SIZE", 2)
+    @patch("requests.Session.get")
+    def test_drive_distance_matrix_gmaps(self, mock_get, monkeypatch):
+        monkeypatch.setenv("GMAPS_API_KEY", "secret")
+
+        def response(url, **_):
+            # Each block answers 1 km per origin of the block, and the second
+            # destination of each block has no route
+            query = url.split("origins=")[1]
+            origins = query.split("&")[0].split("|")
+            destinations = query.split("destinations=")[1].split("&")[0].split("|")
+            element = {"status": "OK", "distance": {"value": 1000}}
+            element["duration"] = {"value": 60}
+            elements = [element, {"status": "ZERO_RESULTS"}][: len(destinations)]
+            mock_response = Mock(status_code=200)
+            mock_response.json.return_value = {
+                "status": "OK",
+                "rows": [{"elements": elements} for _ in origins],
+            }
+            return mock_response
+
+        mock_get.side_effect = response
+        origins = [(0, 0), (0, 1), (1, 1)]
+        destinations = [(2, 2), (3, 3), (4, 4)]
+        distances, durations = drive_distance_matrix_gmaps(origins, destinations)
+
+        # Two blocks of origins by two blocks of destinations
+        assert mock_get.call_count == 4
+        assert "key=secret" in mock_get.call_args.args[0]
+        expected = np.array([[1, np.nan, 1], [1, np.nan, 1], [1, np.nan, 1]])
+        np.testing.assert_array_equal(distances, expected)
+        np.testing.assert_array_equal(durations, expected)
+
+
 class TestGetDistance:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        clear_requests_cache()
+        yield
+        clear_requests_cache()
+
     def test_get_distance_haversine(self):
         location1 = (0, 0)
         location2 = (0, 1)
@@ -77,6 +414,14 @@ class TestGetDistance:
         assert pytest.approx(distance, 0.1) == 111.32
         assert duration == 0
 
+    def test_get_distance_equirectangular(self):
+        location1, location2 = (-3.7319, -38.5267), (-3.8, -38.45)
+        distance, duration = get_distance(location1, location2, "equirectangular")
+        expected = haversine(*location1, *location2)
+        assert distance == pytest.approx(expected, rel=1e-3)
+        assert duration == 0
+        assert equirectangular(*location1, *location1) == 0
+
     @patch("lmr_analyzer.utils.drive_distance_osm")
     def test_get_distance_osm(self, mock_drive_distance_osm):
         mock_drive_distance_osm.return_value = (100, 60)
@@ -103,9 +448,135 @@ class TestGetDistance:
         distance, duration = get_distance(location1, location2, mode="gmaps")
         assert distance == 100
         assert duration == 60
+        # The requests reuse the pooled connections of the shared session
+        assert mock_drive_distance_gmaps.call_args.kwargs["session"] is HTTP_SESSION
+
+    @patch("lmr_analyzer.utils.drive_distance_osm")
+    def test_get_distances(self, mock_drive_distance_osm):
+        mock_drive_distance_osm.side_effect = lambda a, b, session: (a[0], b[0])
+        origins, destinations = [(1, 0), (2, 0), (3, 0)], [(4, 0), (5, 0), (6, 0)]
+
+        distances, durations = get_distances(origins, destinations, mode="osm")
+        assert np.array_equal(distances, [1, 2, 3])
+        assert np.array_equal(durations, [4, 5, 6])
+
+        distances, durations = get_distances([(0, 0), (1, 2)], [(0, 1), (3, 4)])
+        assert distances[0] == pytest.approx(111.19, rel=1e-3)
+        assert distances[1] == pytest.approx(haversine(1, 2, 3, 4))
+        assert np.array_equal(durations, [0, 0])
+
+    @pytest.mark.parametrize("max_workers", [1, 4])
+    @patch("lmr_analyzer.utils.drive_distance_osm", return_value=(1, 2))
+    def test_get_distances_uses_the_session(self, mock_drive_distance_osm, max_workers):
+        session = requests.Session()
+        get_distances([(1, 0), (2, 0)], [(3, 0), (4, 0)], "osm", session, max_workers)
+
+        assert mock_drive_distance_osm.call_count == 2
+        for call in mock_drive_distance_osm.call_args_list:
+            assert call.args[2] is session
+
+    @patch("lmr_analyzer.utils.drive_distance_osm", return_value=(100, 60))
+    def test_get_distance_is_memoized(self, mock_drive_distance_osm):
+        get_distance((40.7128, -74.0060), (34.0522, -118.2437), mode="osm")
+        # Differences below the rounding precision hit the same entry
+        distance, _ = get_distance(
+            (40.71280001, -74.0060), (34.0522, -118.2437), mode="osm"
+        )
+        assert distance == 100
+        assert mock_drive_distance_osm.call_count == 1
+
+        clear_requests_cache()
+        get_distance((40.7128, -74.0060), (34.0522, -118.2437), mode="osm")
+        assert mock_drive_distance_osm.call_count == 2
+
+    @patch("lmr_analyzer.utils.drive_distance_osm", return_value=(100, 60))
+    def test_get_distance_is_memoized_across_sessions(self, mock_drive_distance_osm):
+        for _ in range(3):
+            get_distance((1, 0), (2, 0), mode="osm", session=requests.Session())
+        assert mock_drive_distance_osm.call_count == 1
 
     def test_get_distance_invalid_mode(self):
         location1 = (0, 0)
         location2 = (0, 1)
         with pytest.raises(ValueError):
             get_distance(location1, location2, mode="invalid_mode")
+
+
+class TestNanStatistics:
+    def test_nan_statistics(self):
+        values = np.array([1.0, np.nan, 3.0, 2.0])
+        assert nan_statistics(values) == (6.0, 2.0, 3.0, 1.0)
+
+    def test_nan_statistics_all_nan(self):
+        total, mean, maximum, minimum = nan_statistics([np.nan, np.nan])
+        assert total == 0
+        assert np.isnan(mean) and np.isnan(maximum) and np.isnan(minimum)
+
+
+class TestAklToussaintFilter:
+    def test_interior_points_are_discarded(self):
+        rng = np.random.default_rng(42)
+        points = rng.normal(size=(500, 2))
+        filtered = akl_toussaint_filter(points)
+
+        assert len(filtered) < len(points) / 4
+        hull, filtered_hull = ConvexHull(points), ConvexHull(filtered)
+        assert filtered_hull.volume == pytest.approx(hull.volume)
+        np.testing.assert_array_equal(
+            np.unique(points[hull.vertices], axis=0),
+            np.unique(filtered[filtered_hull.vertices], axis=0),
+        )
+
+    def test_collinear_points_are_kept(self):
+        points = np.column_stack((np.arange(5.0), np.arange(5.0)))
+        np.testing.assert_array_equal(akl_toussaint_filter(points), points)
+
+
+class TestMinimumRotatedRectangle:
+    def test_minimum_rotated_rectangle(self):
+        coords = np.array([[0, 0], [2, 0], [2, 1], [0, 1.5], [1, 0.5]])
+        rectangle = minimum_rotated_rectangle(coords)
+        # The axis aligned box of the hull is the minimum area rectangle
+        assert rectangle.area == pytest.approx(3)
+        assert rectangle.centroid.x == pytest.approx(1)
+        assert rectangle.centroid.y == pytest.approx(0.75)
+
+    @pytest.mark.parametrize(
+        "coords, geom_type",
+        [
+            ([[1, 1]], "Point"),
+            ([[1, 1], [1, 1], [2, 3]], "LineString"),
+            ([[0, 0], [1, 1], [2, 2], [3, 3]], "LineString"),
+        ],
+    )
+    def test_degenerate_minimum_rotated_rectangle(self, coords, geom_type):
+        rectangle = minimum_rotated_rectangle(np.array(coords))
+        assert rectangle.geom_type == geom_type
+        assert rectangle.area == 0
+
+    @patch("lmr_analyzer.utils.akl_toussaint_filter", wraps=akl_toussaint_filter)
+    def test_minimum_rotated_rectangle_filter_threshold(self, mock_filter):
+        minimum_rotated_rectangle(np.array([[0, 0], [2, 0], [2, 1], [0, 1.5]]))
+        mock_filter.assert_not_called()
+        with patch("lmr_analyzer.utils.AKL_TOUSSAINT_MIN_POINTS", 0):
+            rectangle = minimum_rotated_rectangle(
+                np.array([[0, 0], [2, 0], [2, 1], [0, 1.5]])
+            )
+        mock_filter.assert_called_once()
+        assert rectangle.area == pytest.approx(3)
+
+    def test_hull_minimum_rotated_rectangle(self):
+        # A square rotated by 45 degrees is its own minimum rectangle
+        vertices = np.array([[1, 0], [2, 1], [1, 2], [0, 1]])
+        rectangle = hull_minimum_rotated_rectangle(vertices)
+        assert rectangle.area == pytest.approx(2)
+        assert rectangle.centroid.x == pytest.approx(1)
+        assert rectangle.centroid.y == pytest.approx(1)
+
+    def test_rotating_calipers(self):
+        vertices = np.array([[0, 0], [2, 0], [2, 1], [0, 1]])
+        corners, area, min_edge, max_edge, angle = rotating_calipers(vertices)
+        assert corners.shape == (4, 2)
+        assert area == pytest.approx(2)
+        assert (min_edge, max_edge) == pytest.approx((1, 2))
+        assert angle % 90 == pytest.approx(0)